@@ -0,0 +1,256 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+import polars as pl
+
+
+COUNTRY = "BM"
+SOURCE_ROWS = 10_000
+DEFAULT_SCALES = [1_000, 100_000, 1_000_000]
+STAGES = [
+    "DimEmployee",
+    "DimEmployeeContract",
+    "FactEmployeePayroll",
+    "FactEmployeeAbsence",
+    "FactEmployeeDisability",
+    "ETLPipeline",
+]
+YEAR, MONTH = 2025, 4
+IMPORT_MODULES = ["main", "helpers.data_manager"]
+IMPORT_BUDGET_SECONDS = 1.0
+CLI_ROWS = 1_000
+
+
+def source_path(fixtures_dir: str, table: str) -> str:
+    return os.path.join(fixtures_dir, f"PAYROLL_AMR_{COUNTRY}001_{table}_D20251105.csv")
+
+
+def write_fixtures(fixtures_dir: str, rows: int = SOURCE_ROWS, seed: int = 0):
+    rnd = random.Random(seed)
+    signed = lambda: f"{rnd.uniform(1, 9999):.2f}" + ("-" if rnd.random() < 0.1 else "")
+
+    groups = [rnd.randint(1, 6) for _ in range(rows)]
+    pl.DataFrame({
+        "EmployeeSourceId": range(100_000, 100_000 + rows),
+        "TerminationReasonCode": [rnd.choice(["T01", "T02", "T03", "T04"]) for _ in range(rows)],
+        "CostCenterId": [f"CC{rnd.randint(1, 200):04d}" for _ in range(rows)],
+        "Localization": [rnd.choice(["MAD", "BCN", "VLC", "SEV", "BIO"]) for _ in range(rows)],
+        "EmployeeGroupId": groups,
+        "EmployeeGroupName": [f"Group {g}" for g in groups],
+    }).write_csv(source_path(fixtures_dir, "DIM001"), separator=";")
+
+    amounts = [signed() for _ in range(rows)]
+    pl.DataFrame({
+        "EmployeeId": range(100_000, 100_000 + rows),
+        "WageComponentCode": [f"W{rnd.randint(1, 80):03d}" for _ in range(rows)],
+        "PayGroupCode": [f"PG{rnd.randint(1, 8)}" for _ in range(rows)],
+        "PayoutAmount": amounts,
+        "PayoutAmountEuro": amounts,
+        "HoursAmount": [f"{rnd.randint(0, 99)}.0" + ("-" if rnd.random() < 0.1 else "") for _ in range(rows)],
+    }).write_csv(source_path(fixtures_dir, "FACT001"), separator=";")
+
+    pl.DataFrame({
+        "EmployeeId": range(100_000, 100_000 + rows),
+        "AbsenceCode": [f"A{rnd.randint(1, 25):02d}" for _ in range(rows)],
+    }).write_csv(source_path(fixtures_dir, "FACT006"), separator=";")
+
+    pl.DataFrame({
+        "EmployeeId": range(100_000, 100_000 + rows),
+        "DisabilityId": [rnd.randint(1, 5) for _ in range(rows)],
+    }).write_csv(source_path(fixtures_dir, "FACT002"), separator=";")
+
+    pl.DataFrame({
+        "EmployeeContractId": range(1, rows + 1),
+        "PayGroupCode": [f"PG{rnd.randint(1, 8)}" for _ in range(rows)],
+    }).write_csv(source_path(fixtures_dir, "DIM009"), separator=";")
+
+
+def synthetic_dim_employee(rows: int) -> pl.DataFrame:
+    return pl.DataFrame({
+        "EmployeeSourceId": range(200_000, 200_000 + rows),
+        "CostCenterId": [f"CC{i % 200:04d}" for i in range(rows)],
+    })
+
+
+def run_stage(stage: str, rows: int, fixtures_dir: str, output_dir: str, seed: int) -> Dict:
+    from helpers.data_manager import DataManager
+    from helpers.writers import OutputConfig
+    from main import ETLPipeline
+
+    dim_employee = synthetic_dim_employee(rows)
+    rss_before_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    stages: Dict[str, Callable[[], int]] = {
+        "DimEmployee": lambda: len(
+            DataManager(source_path(fixtures_dir, "DIM001"), rows, seed).generate_dim_employee()
+        ),
+        "DimEmployeeContract": lambda: len(
+            DataManager(source_path(fixtures_dir, "DIM009"), rows, seed).generate_dim_employee_contract(dim_employee)
+        ),
+        "FactEmployeePayroll": lambda: len(
+            DataManager(source_path(fixtures_dir, "DIM001"), rows, seed)
+                .generate_fact_employee_payroll(dim_employee, YEAR, MONTH, source_path(fixtures_dir, "FACT001"))
+        ),
+        "FactEmployeeAbsence": lambda: len(
+            DataManager(source_path(fixtures_dir, "DIM001"), rows, seed)
+                .generate_fact_employee_absence(dim_employee, YEAR, MONTH, source_path(fixtures_dir, "FACT006"))
+        ),
+        "FactEmployeeDisability": lambda: len(
+            DataManager(source_path(fixtures_dir, "DIM001"), rows, seed)
+                .generate_fact_employee_disability(dim_employee, YEAR, MONTH)
+        ),
+        "ETLPipeline": lambda: run_pipeline(ETLPipeline(COUNTRY, seed, OutputConfig(root=output_dir)), rows, fixtures_dir),
+    }
+
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    rows_produced = stages[stage]()
+    wall, cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+
+    return {
+        "stage": stage,
+        "rows": rows,
+        "rows_produced": rows_produced,
+        "wall_seconds": round(wall, 4),
+        "cpu_seconds": round(cpu, 4),
+        "rows_per_second": round(rows_produced / wall, 1) if wall else None,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "rss_before_mb": round(rss_before_kb / 1024, 1),
+    }
+
+
+def run_pipeline(pipeline, rows: int, fixtures_dir: str) -> int:
+    pipeline.generate_dim_employee(source_path(fixtures_dir, "DIM001"), rows, "DIM001")
+    pipeline.generate_fact_table("FactEmployeePayroll", source_path(fixtures_dir, "FACT001"), "FACT001", YEAR, MONTH)
+    pipeline.generate_fact_table("FactEmployeeAbsence", source_path(fixtures_dir, "FACT006"), "FACT006", YEAR, MONTH)
+    pipeline.generate_fact_table("FactEmployeeDisability", source_path(fixtures_dir, "FACT002"), "FACT002", YEAR, MONTH)
+    pipeline.generate_dim_employee_contract(source_path(fixtures_dir, "DIM009"), rows, "DIM009")
+    return rows
+
+
+def measure_startup(fixtures_dir: str, output_dir: str, repeats: int = 3) -> Dict:
+    # a cold job pays interpreter start and imports before it generates a row, so time whole fresh processes
+    def best_of(command: List[str]) -> float:
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, *command], cwd=SRC_DIR, check=True, stdout=subprocess.DEVNULL)
+            times.append(time.perf_counter() - start)
+        return round(min(times), 4)
+
+    cli = [
+        "-m", "main", "--country", COUNTRY, "--source-date", "20251105", "--input-root", os.path.dirname(fixtures_dir),
+        "--output", output_dir, "--tables", "DimEmployee", "--rows", str(CLI_ROWS), "--seed", "0",
+    ]
+    return {
+        "interpreter_seconds": best_of(["-c", "pass"]),
+        "import_seconds": {module: best_of(["-c", f"import {module}"]) for module in IMPORT_MODULES},
+        "cli_seconds": best_of(cli),
+        "cli_rows": CLI_ROWS,
+    }
+
+
+def over_budget(startup: Dict, budget: float) -> List[str]:
+    return [
+        f"import {module}: {seconds:.3f}s exceeds the {budget:.3f}s budget"
+        for module, seconds in startup["import_seconds"].items()
+        if seconds > budget
+    ]
+
+
+def run_isolated(stage: str, rows: int, fixtures_dir: str, output_dir: str, seed: int) -> Dict:
+    # every measurement gets a fresh interpreter so peak RSS and caches belong to that stage only
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(run_stage, stage, rows, fixtures_dir, output_dir, seed).result()
+
+
+def compare(results: List[Dict], baseline: List[Dict], tolerance: float) -> List[str]:
+    baseline_by_key = {(r["stage"], r["rows"]): r for r in baseline}
+    regressions = []
+
+    for result in results:
+        reference = baseline_by_key.get((result["stage"], result["rows"]))
+        if reference is None or not reference.get("rows_per_second"):
+            continue
+        ratio = result["rows_per_second"] / reference["rows_per_second"]
+        if ratio < 1 - tolerance:
+            regressions.append(
+                f"{result['stage']} @ {result['rows']}: {result['rows_per_second']} rows/s "
+                f"vs baseline {reference['rows_per_second']} rows/s ({ratio:.0%})"
+            )
+
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the dataset generators")
+    parser.add_argument("--scales", type=lambda s: [int(x) for x in s.split(",")], default=DEFAULT_SCALES)
+    parser.add_argument("--stages", type=lambda s: s.split(","), default=STAGES)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed rows/s drop against the baseline")
+    parser.add_argument(
+        "--import-budget", type=float, default=IMPORT_BUDGET_SECONDS,
+        help="seconds a fresh interpreter may take to import each of IMPORT_MODULES"
+    )
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        fixtures_dir = os.path.join(work_dir, "input", COUNTRY)
+        output_dir = os.path.join(work_dir, "output")
+        os.makedirs(fixtures_dir)
+        write_fixtures(fixtures_dir)
+
+        startup = measure_startup(fixtures_dir, output_dir)
+        print(f"{'interpreter':<36} {startup['interpreter_seconds']:>9.3f}s")
+        for module, seconds in startup["import_seconds"].items():
+            print(f"{'import ' + module:<36} {seconds:>9.3f}s")
+        print(f"{f'cli {CLI_ROWS:,} rows':<36} {startup['cli_seconds']:>9.3f}s")
+
+        for rows in args.scales:
+            for stage in args.stages:
+                result = run_isolated(stage, rows, fixtures_dir, output_dir, args.seed)
+                results.append(result)
+                print(
+                    f"{stage:<24} {rows:>10,} rows  {result['wall_seconds']:>9.3f}s  "
+                    f"{result['rows_per_second'] or 0:>12,.0f} rows/s  {result['peak_rss_mb']:>8.1f} MB"
+                )
+
+    report = {
+        "python": platform.python_version(),
+        "polars": pl.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "startup": startup,
+        "import_budget_seconds": args.import_budget,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    regressions = over_budget(startup, args.import_budget)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions += compare(results, json.load(f)["results"], args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
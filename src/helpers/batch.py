@@ -0,0 +1,102 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import repeat
+from typing import Dict, List, Optional, Sequence, Tuple
+import multiprocessing
+import os
+
+from helpers.pools import DEFAULT_LOCALE, get_identity_pools
+from helpers.tables import DIM_EMPLOYEE, DIM_EMPLOYEE_CONTRACT, TableSpec, derive_seed, generate_table
+from helpers.writers import OutputConfig, write_table
+
+
+DEFAULT_INPUT_ROOT = "./src/data/input"
+DEFAULT_SOURCE_DATE = "20251105"
+TABLE_FILES: Dict[str, str] = {
+    DIM_EMPLOYEE: "DIM001",
+    "FactEmployeePayroll": "FACT001",
+    "FactEmployeeAbsence": "FACT006",
+    "FactEmployeeDisability": "FACT002",
+    DIM_EMPLOYEE_CONTRACT: "DIM009",
+}
+
+
+def country_tables(
+    country: str,
+    input_root: str = DEFAULT_INPUT_ROOT,
+    source_date: str = DEFAULT_SOURCE_DATE,
+    tables: Optional[Sequence[str]] = None
+) -> List[TableSpec]:
+    src_root = os.path.join(input_root, country, f"PAYROLL_AMR_{country}001")
+    return [
+        TableSpec(table, f"{src_root}_{TABLE_FILES[table]}_D{source_date}.csv", TABLE_FILES[table])
+        for table in (tables or TABLE_FILES)
+    ]
+
+
+@dataclass(frozen=True)
+class CountryJob:
+    country: str
+    rows_amt: int
+    tables: Optional[List[TableSpec]] = None
+    locale: str = DEFAULT_LOCALE
+
+    def __post_init__(self):
+        if self.tables is None:
+            object.__setattr__(self, "tables", country_tables(self.country))
+
+
+def run_country(job: CountryJob, year: int, month: int, seed: Optional[int], output: OutputConfig) -> Dict[str, List[str]]:
+    # each country gets its own seed stream; ids continue from its own source file and land in its own output dir
+    country_seed = derive_seed(seed, job.country)
+    results = {}
+    outputs = {}
+
+    for spec in sorted(job.tables, key=lambda t: t.table != DIM_EMPLOYEE):
+        results[spec.table] = generate_table(
+            spec, job.rows_amt, year, month, derive_seed(country_seed, spec.table), results, locale=job.locale
+        )
+        outputs[spec.file_name] = write_table(results[spec.table], output, job.country, spec.file_name)
+
+    return outputs
+
+
+def run_batch(
+    jobs: List[CountryJob],
+    year: int,
+    month: int,
+    workers: int = 1,
+    seed: Optional[int] = None,
+    output: Optional[OutputConfig] = None
+) -> Dict[str, Dict[str, List[str]]]:
+    output = output or OutputConfig()
+    countries = [job.country for job in jobs]
+    if len(set(countries)) != len(countries):
+        raise ValueError(f"Duplicate countries in batch: {countries}")
+
+    locales = tuple(sorted({job.locale for job in jobs}))
+    if workers <= 1:
+        _warm_up(locales)
+        return {job.country: run_country(job, year, month, seed, output) for job in jobs}
+
+    # biggest countries first so a long tail does not end up on one worker
+    ordered = sorted(jobs, key=lambda job: job.rows_amt, reverse=True)
+    # worker processes are reused across countries, so pools and cached lookups are loaded once per worker
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_warm_up,
+        initargs=(locales,)
+    ) as pool:
+        results = dict(zip(
+            [job.country for job in ordered],
+            pool.map(run_country, ordered, repeat(year), repeat(month), repeat(seed), repeat(output))
+        ))
+
+    return {country: results[country] for country in countries}
+
+
+def _warm_up(locales: Tuple[str, ...]):
+    for locale in locales:
+        get_identity_pools(locale)
+
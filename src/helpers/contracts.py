@@ -0,0 +1,98 @@
+from datetime import date
+from typing import Optional, Tuple
+
+import numpy as np
+import polars as pl
+
+from helpers.dates import DAY, OPEN_END_KEY, to_key
+from helpers.schemas import CONTRACT_TYPE
+
+
+DEFAULT_CONTRACTS_PER_EMPLOYEE = (1, 3)
+DEFAULT_ANNEXES_PER_CONTRACT = (0, 2)
+HISTORY_END = date(2025, 12, 31)
+MAX_RAISE = 0.08
+FIXED_TERM_SHARE = 0.6
+FULL_TIME_EQUIVALENTS = np.array([100, 80, 75, 50], dtype=np.uint8)
+FULL_TIME_WEIGHTS = np.array([0.7, 0.1, 0.1, 0.1])
+
+
+def build_contract_history(
+    rng: np.random.Generator,
+    starts: np.ndarray,
+    terminations: Optional[np.ndarray] = None,
+    contracts_per_employee: Tuple[int, int] = DEFAULT_CONTRACTS_PER_EMPLOYEE,
+    annexes_per_contract: Tuple[int, int] = DEFAULT_ANNEXES_PER_CONTRACT,
+    history_end: date = HISTORY_END
+) -> pl.DataFrame:
+    if contracts_per_employee[0] < 1 or annexes_per_contract[0] < 0:
+        raise ValueError("Every employee needs at least one contract and annex counts cannot be negative")
+
+    num_employees = len(starts)
+    if terminations is None:
+        terminations = np.full(num_employees, np.datetime64("NaT"), dtype="datetime64[D]")
+    is_terminated = ~np.isnat(terminations)
+    # employees still working keep their last contract open, so their history only needs cut points up to history_end
+    horizons = np.maximum(np.where(is_terminated, terminations, np.datetime64(history_end, "D")), starts)
+
+    contract_counts = rng.integers(contracts_per_employee[0], contracts_per_employee[1] + 1, size=num_employees)
+    employee_idx, contract_starts, contract_ends, is_last_contract = _segments(rng, starts, horizons, contract_counts)
+    is_open = is_last_contract & ~is_terminated[employee_idx]
+
+    annex_counts = rng.integers(annexes_per_contract[0], annexes_per_contract[1] + 1, size=len(employee_idx))
+    contract_idx, valid_from, valid_to, is_last_version = _segments(rng, contract_starts, contract_ends, annex_counts + 1)
+    version_employee_idx = employee_idx[contract_idx]
+    is_annex = np.ones(len(contract_idx), dtype=np.uint8)
+    is_annex[_first_index(contract_idx, len(employee_idx))] = 0
+
+    # salaries start from a per-employee base and compound a raise with every later contract or annex
+    first_version = _first_index(version_employee_idx, num_employees)
+    raises = np.log1p(rng.uniform(0, MAX_RAISE, size=len(contract_idx)))
+    raises[first_version] = 0
+    growth = np.cumsum(raises)
+    growth -= growth[first_version][version_employee_idx]
+    base_salaries = rng.integers(100_000, 1_000_000, size=num_employees) / 100
+
+    is_fixed_term = ~is_open & (rng.random(len(employee_idx)) < FIXED_TERM_SHARE)
+    contract_end_keys = np.where(is_open, OPEN_END_KEY, to_key(contract_ends))
+
+    return pl.DataFrame({
+        "EmployeeIdx": version_employee_idx,
+        "ContractIdx": contract_idx,
+        "ContractType": pl.Series(["Fijo", "Temporal"], dtype=CONTRACT_TYPE).gather(is_fixed_term[contract_idx].astype(np.uint8)),
+        "ContractStartDate": to_key(contract_starts)[contract_idx],
+        "ContractEndDate": contract_end_keys[contract_idx],
+        "Salary": np.round(base_salaries[version_employee_idx] * np.exp(growth), 2),
+        "FullTimeEquivalent": rng.choice(FULL_TIME_EQUIVALENTS, size=len(contract_idx), p=FULL_TIME_WEIGHTS),
+        "IsAnnex": is_annex,
+        "ValidFrom": to_key(valid_from),
+        "ValidTo": np.where(is_last_version & is_open[contract_idx], OPEN_END_KEY, to_key(valid_to)),
+    })
+
+
+def _segments(rng: np.random.Generator, starts: np.ndarray, ends: np.ndarray, counts: np.ndarray):
+    # splits every [start, end] into back-to-back pieces of at least a day, cut at uniformly spread random points
+    spans = (ends - starts).astype(np.int64)
+    counts = np.minimum(counts, spans + 1)
+    owner = np.repeat(np.arange(len(starts)), counts)
+    first = _first_index(owner, len(starts))
+    position = np.arange(len(owner)) - first[owner]
+
+    # exponential gaps normalised per owner are the spacings of sorted uniform points, without sorting anything
+    gaps = rng.exponential(size=len(owner))
+    before = np.cumsum(gaps) - gaps
+    before -= before[first][owner]
+    fraction = before / np.bincount(owner, weights=gaps, minlength=len(starts))[owner]
+
+    free_days = spans[owner] - counts[owner] + 1
+    piece_starts = starts[owner] + (position + np.floor(free_days * fraction).astype(np.int64)).astype("timedelta64[D]")
+    is_last = position == counts[owner] - 1
+    piece_ends = np.empty_like(piece_starts)
+    piece_ends[:-1] = piece_starts[1:] - DAY
+    piece_ends[is_last] = ends[owner[is_last]]
+    return owner, piece_starts, piece_ends, is_last
+
+
+def _first_index(owner: np.ndarray, num_owners: int) -> np.ndarray:
+    counts = np.bincount(owner, minlength=num_owners)
+    return np.cumsum(counts) - counts
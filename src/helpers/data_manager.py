@@ -1,480 +1,341 @@
 from collections.abc import Iterable
-from typing import List, Iterator
-from datetime import datetime, timedelta
+from typing import List, Iterator, Optional, Tuple
+from datetime import date
 from itertools import cycle, islice
-from calendar import monthrange
-from decimal import Decimal
-from faker import Faker
 
+import numpy as np
 import polars as pl
-import pycountry
-import random
+
+from helpers.contracts import DEFAULT_ANNEXES_PER_CONTRACT, DEFAULT_CONTRACTS_PER_EMPLOYEE, HISTORY_END, build_contract_history
+from helpers.dates import from_key, key_series, payroll_periods, random_dates, to_key, today_key
+from helpers.hierarchy import DEFAULT_MAX_DEPTH, DEFAULT_SPAN_OF_CONTROL, build_hierarchy
+from helpers.intervals import generate_intervals
+from helpers.lookup_cache import LOOKUP_CACHE, LookupCache, SourceLookup
+from helpers.pools import DEFAULT_LOCALE, IdentityPools, full_name, get_identity_pools, work_email
+from helpers.sampling import EMPIRICAL
+from helpers.schemas import CURRENCY, FLAG, SIGNED_AMOUNT_COLUMNS, conform, to_legacy_csv
+from helpers.writers import OutputConfig, write_table
+
+
+PAYROLL_ROWS_PER_EMPLOYEE = np.array([1, 2, 3])
+PAYROLL_ROWS_WEIGHTS = np.array([0.5, 0.25, 0.25])
+POSITION_LEVELS = {"Intern": 1, "Contractor": 2, "Employee": 3, "Manager": 4}
+
+
+def parse_signed_amount(col: pl.Expr) -> pl.Expr:
+    # SAP extracts put the sign after the number, e.g. "120.50-"; both branches are evaluated, so both cast the stripped text
+    magnitude = col.str.strip_suffix("-").cast(pl.Float64)
+    return pl.when(col.str.ends_with("-")).then(-magnitude).otherwise(magnitude)
 
 
 class DataManager:
-    def __init__(self, path: str, rows_amt: int):
+    lookup_cache: LookupCache = LOOKUP_CACHE
+    span_of_control: int = DEFAULT_SPAN_OF_CONTROL
+    max_hierarchy_depth: int = DEFAULT_MAX_DEPTH
+    sampling: str = EMPIRICAL
+    contracts_per_employee: Tuple[int, int] = DEFAULT_CONTRACTS_PER_EMPLOYEE
+    annexes_per_contract: Tuple[int, int] = DEFAULT_ANNEXES_PER_CONTRACT
+
+    def __init__(self, path: str, rows_amt: int, seed: Optional[int] = None, locale: str = DEFAULT_LOCALE):
         self.path = path
         self.rows_amt = rows_amt
-        self.fake = Faker()
+        self.seed = seed
+        self.locale = locale
+        self.rng = np.random.default_rng(seed)
 
-    def read_file(self):
-        df = pl.read_csv(
+    @property
+    def identity_pools(self) -> IdentityPools:
+        return get_identity_pools(self.locale)
+
+    def scan_file(self) -> pl.LazyFrame:
+        # scan_csv memory-maps local files and only materialises the columns a query selects
+        source = pl.scan_csv(
             self.path,
             has_header=True,
             separator=";",
-            dtypes={
-                "PayoutAmount": pl.Utf8,
-                "PayoutAmountEuro": pl.Utf8,
-                "HoursAmount": pl.Utf8
-            },
+            schema_overrides={col: pl.Utf8 for col in SIGNED_AMOUNT_COLUMNS},
             infer_schema_length=1000
         )
+        columns = source.collect_schema().names()
+
+        return source.with_columns([
+            parse_signed_amount(pl.col(col)) for col in SIGNED_AMOUNT_COLUMNS if col in columns
+        ])
+
+    def read_file(self, columns: Optional[List[str]] = None, predicate: Optional[pl.Expr] = None) -> pl.DataFrame:
+        source = self.scan_file()
+        if predicate is not None:
+            source = source.filter(predicate)
+        if columns is not None:
+            source = source.select(columns)
 
-        for col in ["PayoutAmount", "PayoutAmountEuro", "HoursAmount"]:
-            if col in df.columns:
-                df = df.with_columns([
-                    pl.Series(
-                        name=col,
-                        values=[-float(x[:-1]) if x.endswith("-") else float(x) for x in df[col]]
-                    )
-                ])
+        return source.collect()
 
-        return df
+    def source_lookup(self) -> SourceLookup:
+        return self.lookup_cache.get(self.path, self.scan_file)
 
     def extract_column_names(self):
-        headers = self.read_file().columns
+        headers = self.source_lookup().columns
         return headers
     
     def generate_new_employee_ids(self, col_name: str) -> Iterable[int]:
-        max_employee_id: int = (
-            self.read_file()
-                .select(pl.col(col_name).max())
-                .item()
-        )
+        max_employee_id: int = self.source_lookup().max(col_name)
 
         for i in range(1, self.rows_amt + 1):
             yield max_employee_id + i
 
-    def extract_list_of_random_values_from_file(self, col_name: str):
-        values_list: List[str] = (
-            self.read_file()
-                .select(pl.col(col_name).unique())
-                .to_series()
-                .to_list()
-        )
+    def extract_list_of_random_values_from_file(self, col_name: str, rows_amt: Optional[int] = None):
+        yield from self.sample_values(col_name, rows_amt)
+
+    def sample_values(
+        self,
+        col_name: str,
+        size: Optional[int] = None,
+        source: Optional[SourceLookup] = None,
+        drop_nulls: bool = False
+    ) -> pl.Series:
+        return self.sample_rows([col_name], size, source, drop_nulls).to_series()
+
+    def sample_rows(
+        self,
+        col_names: List[str],
+        size: Optional[int] = None,
+        source: Optional[SourceLookup] = None,
+        drop_nulls: bool = False
+    ) -> pl.DataFrame:
+        sampler = (source or self.source_lookup()).sampler(col_names, self.sampling, drop_nulls)
+        return sampler.sample(self.rng, self.rows_amt if size is None else size)
 
-        for i in range(self.rows_amt):
-            yield random.choice(values_list)
-
-    
-    def generate_random_decimals(self, l_digs: int, r_digs: int, h_amt: bool = False) -> Iterator[Decimal]:
-        for _ in range(self.rows_amt):
-            if h_amt:
-                base = self.fake.random_int(min=0, max=10**l_digs - 1)
-                half = self.fake.random_element([0, 0.5])
-                yield Decimal(base + half)
-            else:
-                yield Decimal(
-                    self.fake.pydecimal(
-                        left_digits=l_digs,
-                        right_digits=r_digs,
-                        positive=True
-                    )
-                )
     
-    def generate_payroll_dates(self, start_year: int, start_month: int, months_count: int) -> Iterator[List[int]]:
-        year = start_year
-        month = start_month
-
-        for _ in range(months_count):
-            start_date = datetime(year, month, 1)
-            last_day = monthrange(year, month)[1]
-            end_date = datetime(year, month, last_day)
-            payroll_date = end_date - timedelta(days=1)
-            payroll_number = int(start_date.strftime("%Y%m"))
-
-            yield [
-                int(start_date.strftime("%Y%m%d")),
-                int(end_date.strftime("%Y%m%d")),
-                int(payroll_date.strftime("%Y%m%d")),
-                payroll_number
-            ]
-
-            if month == 12:
-                month = 1
-                year += 1
-            else:
-                month += 1
-
-    def generate_dates(self, start_date: datetime, end_date: datetime) -> Iterator[List[int]]:
-        delta_days = (end_date - start_date).days
-
-        for _ in range(self.rows_amt):
-            random_days = random.randint(0, delta_days)
-            birth_date = start_date + timedelta(days=random_days)
-            yield [int(birth_date.strftime("%Y%m%d"))]
-            
-
-    def generate_fact_employee_payroll(self, dim_employee_df: pl.DataFrame, year: int, month: int, lookup_path: str):
-        employee_ids = dim_employee_df["EmployeeSourceId"].to_list()
-        cost_center_ids = dim_employee_df["CostCenterId"].to_list()
-        lookup_dm = DataManager(lookup_path, len(employee_ids))
-        wage_component_codes = list(lookup_dm.extract_list_of_random_values_from_file("WageComponentCode"))
-        pay_group_codes = list(lookup_dm.extract_list_of_random_values_from_file("PayGroupCode"))
-
-        all_rows = []
-
-        for emp_id, cost_center in zip(employee_ids, cost_center_ids):
-            num_rows = random.choice([1, 1, 2, 3])
-            used_dates = []
-
-            for _ in range(num_rows):
-                for pd in self.generate_payroll_dates(year, month, 6):
-                    if pd not in used_dates:
-                        used_dates.append(pd)
-                        payroll_date = pd
-                        break
-
-                is_negative = random.random() < 0.1
-                h = float(next(self.generate_random_decimals(2, 0, True)))
-                s = float(next(self.generate_random_decimals(4, 2)))
-                if is_negative:
-                    h_str = f"{h}-"
-                    s_str = f"{s}-"
-                else:
-                    h_str = str(h)
-                    s_str = str(s)
-
-                all_rows.append({
-                    "EmployeeId": emp_id,
-                    "CostCenterId": cost_center,
-                    "WageComponentCode": random.choice(wage_component_codes),
-                    "PayGroupCode": random.choice(pay_group_codes),
-                    "PayoutStartDate": payroll_date[0],
-                    "PayoutEndDate": payroll_date[1],
-                    "PayrollDate": payroll_date[2],
-                    "PayrollNumber": payroll_date[3],
-                    "PayoutAmount": s_str,
-                    "PayoutAmountEuro": s_str,
-                    "CurrencyCode": "EUR",
-                    "HoursAmount": h_str
-                })
-
-        return pl.DataFrame(all_rows)
+    def generate_payroll_dates(self, start_year: int, start_month: int, months_count: int) -> np.ndarray:
+        return payroll_periods(start_year, start_month, months_count)
+
+    def generate_fact_table(
+        self,
+        fact_name: str,
+        dim_employee_df: pl.DataFrame,
+        year: int,
+        month: int,
+        lookup_path: str,
+        payroll_months: Optional[int] = None
+    ) -> pl.DataFrame:
+        if fact_name == "FactEmployeePayroll":
+            return self.generate_fact_employee_payroll(dim_employee_df, year, month, lookup_path=lookup_path, months=payroll_months)
+        elif fact_name == "FactEmployeeAbsence":
+            return self.generate_fact_employee_absence(dim_employee_df, year, month, lookup_path=lookup_path)
+        elif fact_name == "FactEmployeeDisability":
+            return self.generate_fact_employee_disability(dim_employee_df, year, month)
+        else:
+            raise ValueError(f"Unknown fact table: {fact_name}")
+
+    def generate_fact_employee_payroll(
+        self,
+        dim_employee_df: pl.DataFrame,
+        year: int,
+        month: int,
+        lookup_path: str,
+        months: Optional[int] = None
+    ) -> pl.DataFrame:
+        num_employees = len(dim_employee_df)
+        lookup = DataManager(lookup_path, num_employees).source_lookup()
+
+        if months is None:
+            rows_per_employee = self.rng.choice(PAYROLL_ROWS_PER_EMPLOYEE, size=num_employees, p=PAYROLL_ROWS_WEIGHTS)
+        else:
+            rows_per_employee = np.full(num_employees, months)
+        num_rows = int(rows_per_employee.sum())
+        employee_idx = np.repeat(np.arange(num_employees), rows_per_employee)
+        # each extra row of an employee takes the next unused payroll month
+        period_idx = np.arange(num_rows) - np.repeat(np.cumsum(rows_per_employee) - rows_per_employee, rows_per_employee)
+
+        periods = self.generate_payroll_dates(year, month, int(rows_per_employee.max(initial=1)))[period_idx]
+
+        is_negative = self.rng.random(num_rows) < 0.1
+        hours = self.rng.integers(0, 100, size=num_rows) + self.rng.choice([0.0, 0.5], size=num_rows)
+        salaries = self.rng.integers(100_000, 1_000_000, size=num_rows) / 100
+
+        payout_amount = pl.Series(np.where(is_negative, -salaries, salaries))
+
+        payroll = dim_employee_df.select(
+            pl.col("EmployeeSourceId").gather(employee_idx).alias("EmployeeId"),
+            pl.col("CostCenterId").gather(employee_idx),
+        ).with_columns(
+            self.sample_values("WageComponentCode", num_rows, lookup),
+            self.sample_values("PayGroupCode", num_rows, lookup),
+            pl.Series("PayoutStartDate", periods[:, 0]),
+            pl.Series("PayoutEndDate", periods[:, 1]),
+            pl.Series("PayrollDate", periods[:, 2]),
+            pl.Series("PayrollNumber", periods[:, 3]),
+            payout_amount.alias("PayoutAmount"),
+            payout_amount.alias("PayoutAmountEuro"),
+            pl.lit("EUR", dtype=CURRENCY).alias("CurrencyCode"),
+            pl.Series("HoursAmount", np.where(is_negative, -hours, hours)),
+        )
+        return conform(payroll, "FactEmployeePayroll")
 
 
     def generate_fact_employee_disability(self, dim_employee_df: pl.DataFrame, year: int, month: int) -> pl.DataFrame:
-        all_records = []
-        for emp_id in dim_employee_df["EmployeeSourceId"]:
-            num_rows = random.choice([0, 1, 1, 2])
-            used_ranges = []
+        intervals = generate_intervals(self.rng, dim_employee_df["EmployeeSourceId"], year, month, max_duration=60)
 
-            for _ in range(num_rows):
-                start_date = next(self.generate_dates(datetime(year, month, 1), datetime(year, month, monthrange(year, month)[1])))[0]
-                start_dt = datetime.strptime(str(start_date), "%Y%m%d")
-                duration = random.randint(1, 60)
-                end_dt = start_dt + timedelta(days=duration - 1)
-                end_date = int(end_dt.strftime("%Y%m%d"))
+        disability = intervals.select(
+            pl.col("EmployeeId"),
+            pl.Series("DisabilityId", self.rng.integers(1, 6, size=len(intervals), dtype=np.uint8)),
+            pl.col("StartDate"),
+            pl.col("EndDate"),
+        )
+        return conform(disability, "FactEmployeeDisability")
 
-                overlaps = any(start_dt <= e and end_dt >= s for s, e in used_ranges)
-                if overlaps:
-                    continue
 
-                used_ranges.append((start_dt, end_dt))
-                all_records.append({
-                    "EmployeeId": emp_id,
-                    "DisabilityId": random.randint(1, 5),
-                    "StartDate": start_date,
-                    "EndDate": end_date
-                })
+    def generate_fact_employee_absence(self, dim_employee_df: pl.DataFrame, year: int, month: int, lookup_path: str) -> pl.DataFrame:
+        lookup = DataManager(lookup_path, len(dim_employee_df)).source_lookup()
+        intervals = generate_intervals(self.rng, dim_employee_df["EmployeeSourceId"], year, month, max_duration=30)
+
+        absence = intervals.select(
+            pl.col("EmployeeId"),
+            self.sample_values("AbsenceCode", len(intervals), lookup),
+            pl.col("StartDate"),
+            pl.col("EndDate"),
+            pl.col("Days").cast(pl.Float64),
+            pl.col("WorkingDays").cast(pl.Float64),
+            (pl.col("WorkingDays") * 8).cast(pl.Float64).alias("WorkingHours"),
+        )
+        return conform(absence, "FactEmployeeAbsence")
 
-        return pl.DataFrame(all_records)
+    def generate_dim_employee(self, employee_ids: Optional[List[int]] = None) -> pl.DataFrame:
+        if employee_ids is None:
+            employee_ids = list(self.generate_new_employee_ids("EmployeeSourceId"))
 
+        return self._build_dim_employee(employee_ids)
 
-    def generate_fact_employee_absence(self, dim_employee_df: pl.DataFrame, year: int, month: int, lookup_path: str) -> pl.DataFrame:
-        lookup_dm = DataManager(lookup_path, len(dim_employee_df))
-        absence_codes = list(lookup_dm.extract_list_of_random_values_from_file("AbsenceCode"))
-
-        all_records = []
-
-        for emp_id in dim_employee_df["EmployeeSourceId"]:
-            num_rows = random.choice([0, 1, 1, 2])
-            used_ranges = []
-
-            for _ in range(num_rows):
-                absence_code = random.choice(absence_codes)
-                start_date = next(self.generate_dates(datetime(year, month, 1), datetime(year, month, monthrange(year, month)[1])))[0]
-                start_dt = datetime.strptime(str(start_date), "%Y%m%d")
-                duration_days = random.randint(1, 30)
-                end_dt = start_dt + timedelta(days=duration_days - 1)
-                end_date = int(end_dt.strftime("%Y%m%d"))
-
-                overlaps = any(start_dt <= e and end_dt >= s for s, e in used_ranges)
-                if overlaps:
-                    continue
-                used_ranges.append((start_dt, end_dt))
-
-                working_days = min(duration_days, (duration_days // 7) * 5 + duration_days % 7)
-                working_hours = working_days * 8
-
-                all_records.append({
-                    "EmployeeId": emp_id,
-                    "AbsenceCode": absence_code,
-                    "StartDate": start_date,
-                    "EndDate": end_date,
-                    "Days": float(duration_days),
-                    "WorkingDays": float(working_days),
-                    "WorkingHours": float(working_hours)
-                })
-
-        return pl.DataFrame(all_records)
-
-    def generate_dim_employee(self) -> pl.DataFrame:
-        employee_ids = list(self.generate_new_employee_ids("EmployeeSourceId"))
- 
-        first_names = [self.fake.first_name().upper() for _ in range(self.rows_amt)]
-        last_names = [self.fake.last_name().upper() for _ in range(self.rows_amt)]
-        middle_names = [
-            self.fake.first_name().upper() if random.random() < 0.2 else ""
-            for _ in range(self.rows_amt)
-        ]
+    def generate_dim_employee_chunks(self, chunk_size: int) -> Iterator[pl.DataFrame]:
+        first_employee_id = self.source_lookup().max("EmployeeSourceId") + 1
+
+        for offset in range(0, self.rows_amt, chunk_size):
+            chunk_end = min(offset + chunk_size, self.rows_amt)
+            yield self.generate_dim_employee(list(range(first_employee_id + offset, first_employee_id + chunk_end)))
+
+    def _build_dim_employee(self, employee_ids: List[int]) -> pl.DataFrame:
+        rows_amt = len(employee_ids)
  
-        full_names = [
-            f"{f} {m + ' ' if m else ''}{l}"
-            for f, m, l in zip(first_names, middle_names, last_names)
-        ]
+        names = self.identity_pools.sample_names(self.rng, rows_amt)
+        national_ids = self.identity_pools.sample("country_code", self.rng, rows_amt)
+        citizenships = self.identity_pools.sample("country_name", self.rng, rows_amt)
  
-        work_emails = [
-            f"{f.lower()}.{l.lower()}@workmail.com".upper()
-            for f, l in zip(first_names, last_names)
-        ]
+        birth_dates = to_key(random_dates(self.rng, date(1940, 1, 1), date(2008, 1, 1), rows_amt))
+        hire_dates = to_key(random_dates(self.rng, date(2010, 1, 1), date(2023, 12, 31), rows_amt))
  
-        national_ids = [
-            random.choice([c.alpha_2 for c in pycountry.countries]).upper()
-            for _ in range(self.rows_amt)
-        ]
+        termination_dates, termination_reasons = self._generate_termination(rows_amt)
  
-        citizenships = [
-            random.choice([c.name for c in pycountry.countries])
-            for _ in range(self.rows_amt)
-        ]
+        sexs = self.rng.integers(0, 2, size=rows_amt, dtype=np.uint8)
  
-        birth_dates = self._random_dates(
-            datetime(1940, 1, 1),
-            datetime(2008, 1, 1)
-        )
+        is_working = (termination_dates.is_null() | (termination_dates > today_key())).cast(FLAG)
  
-        hire_dates = self._random_dates(
-            datetime(2010, 1, 1),
-            datetime(2023, 12, 31)
+        hierarchy = build_hierarchy(self.rng, rows_amt, self.span_of_control, self.max_hierarchy_depth)
+        positions, levels = self._generate_positions_and_levels(rows_amt, hierarchy.is_manager)
+        supervisor_names = names.select(pl.all().gather(hierarchy.supervisor_idx))
+        name_columns = names.select(
+            pl.all(),
+            full_name(pl.col("FirstName"), pl.col("MiddleName"), pl.col("LastName")).alias("FullName"),
+            work_email(pl.col("FirstName"), pl.col("LastName")).alias("WorkEmail"),
         )
- 
-        termination_dates, termination_reasons = self._generate_termination()
- 
-        positions, levels = self._generate_positions_and_levels()
- 
-        sexs = [random.randint(0, 1) for _ in range(self.rows_amt)]
- 
-        is_working = [
-            0 if (td and td != "" and (
-                datetime.strptime(str(td), "%Y%m%d") if isinstance(td, (int, str)) else td
-            ) <= datetime.now()) else 1
-            for td in termination_dates
-        ]
- 
-        (
-            supervisor_ids,
-            sup_fn,
-            sup_mn,
-            sup_ln,
-            sup_full,
-            positions
-        ) = self._generate_supervision(
-            employee_ids,
-            (first_names, middle_names, last_names),
-            positions
+        supervisor_name_columns = supervisor_names.select(
+            pl.col("FirstName").alias("SupervisorFirstName"),
+            pl.col("MiddleName").alias("SupervisorMiddleName"),
+            pl.col("LastName").alias("SupervisorLastName"),
+            full_name(pl.col("FirstName"), pl.col("MiddleName"), pl.col("LastName")).alias("SupervisorFullName"),
         )
 
-        levels = [
-            {"Intern": 1, "Contractor": 2, "Employee": 3, "Manager": 4}[p]
-            for p in positions
-        ]
- 
-        dept_lvl1, dept_lvl2 = self._generate_departments(positions)
- 
-        return pl.DataFrame({
+        dim_employee = pl.DataFrame({
             "EmployeeSourceId": employee_ids,
-            "FirstName": first_names,
-            "MiddleName": middle_names,
-            "LastName": last_names,
-            "FullName": full_names,
-            "WorkEmail": work_emails,
+            **name_columns.to_dict(),
             "NationalId": national_ids,
             "Citizenship": citizenships,
             "BirthDate": birth_dates,
             "Sex": sexs,
             "IsWorking": is_working,
-            "IsOnAbsence": [random.randint(0, 1) if random.random() < 0.2 else None for _ in range(self.rows_amt)],
-            "IsSuspended": [random.randint(0, 1) if random.random() < 0.2 else None for _ in range(self.rows_amt)],
-            "IsStudent": [random.randint(0, 1) if random.random() < 0.2 else None for _ in range(self.rows_amt)],
-            "IsJuvenile": [random.randint(0, 1) if random.random() < 0.2 else None for _ in range(self.rows_amt)],
-            "HasDisability": [random.randint(0, 1) if random.random() < 0.2 else None for _ in range(self.rows_amt)],
+            "IsOnAbsence": self._random_flags(rows_amt),
+            "IsSuspended": self._random_flags(rows_amt),
+            "IsStudent": self._random_flags(rows_amt),
+            "IsJuvenile": self._random_flags(rows_amt),
+            "HasDisability": self._random_flags(rows_amt),
             "HireDate": hire_dates,
             "TerminationDate": termination_dates,
             "TerminationReasonCode": termination_reasons,
             "Position": positions,
             "Level": levels,
-            "SupervisorId": supervisor_ids,
-            "SupervisorFirstName": sup_fn,
-            "SupervisorMiddleName": sup_mn,
-            "SupervisorLastName": sup_ln,
-            "SupervisorFullName": sup_full,
-            "CostCenterId": list(self.extract_list_of_random_values_from_file("CostCenterId")),
-            "Localization": list(self.extract_list_of_random_values_from_file("Localization")),
-            "EmployeeGroupId": list(self.extract_list_of_random_values_from_file("EmployeeGroupId")),
-            "EmployeeGroupName": list(self.extract_list_of_random_values_from_file("EmployeeGroupName")),
-            "DepartmentLvl1": dept_lvl1,
-            "DepartmentLvl2": dept_lvl2,
-            "DepartmentLvl3": [None] * self.rows_amt,
-            "DepartmentLvl4": [None] * self.rows_amt,
-            "DepartmentLvl5": [None] * self.rows_amt,
-            "SeniorityDays": [random.randint(0, 25000) for _ in range(self.rows_amt)],
+            "SupervisorId": pl.Series(employee_ids).gather(hierarchy.supervisor_idx),
+            **supervisor_name_columns.to_dict(),
+            "CostCenterId": self.sample_values("CostCenterId", rows_amt),
+            "Localization": self.sample_values("Localization", rows_amt),
+            **self.sample_rows(["EmployeeGroupId", "EmployeeGroupName"], rows_amt).to_dict(),
+            **hierarchy.departments.to_dict(),
+            "SeniorityDays": self.rng.integers(0, 25001, size=rows_amt, dtype=np.int32),
         })
+        return conform(dim_employee, "DimEmployee")
     
-    def generate_dim_employee_contract(self, dim_employee_df: pl.DataFrame) -> pl.DataFrame:
-        employee_ids = dim_employee_df["EmployeeSourceId"].to_list()
-        cost_center_ids = dim_employee_df["CostCenterId"].to_list()
-        
-        num_rows = len(employee_ids)
-        
-        employee_contract_ids = list(range(1, num_rows + 1))
-        currency_ids = ["EUR"] * num_rows
-        contract_types = ["Fijo"] * num_rows
-
-        contract_start_dates = [
-            next(self.generate_dates(datetime(2010, 1, 1), datetime(2025, 12, 31)))[0]
-            for _ in range(num_rows)
-        ]
-
-        contract_end_dates = []
-        for start in contract_start_dates:
-            if random.random() < 0.5:
-                contract_end_dates.append(99991231)
-            else:
-                start_dt = datetime.strptime(str(start), "%Y%m%d")
-                end_dt = start_dt + timedelta(days=random.randint(30, 365*5))
-                contract_end_dates.append(int(end_dt.strftime("%Y%m%d")))
-        
-        pay_group_codes = [next(self.extract_list_of_random_values_from_file("PayGroupCode")) for _ in range(num_rows)]
-        salaries = [float(x) for x in self.generate_random_decimals(4, 2)]
-        full_time_equiv = [100] * num_rows
-        is_annex = [None] * num_rows
-        calendar_date_valid_for = [next(self.generate_dates(datetime(2025, 1, 1), datetime(2025, 12, 31)))[0] for _ in range(num_rows)]
-        
-        return pl.DataFrame({
-            "EmployeeContractId": employee_contract_ids,
-            "EmployeeId": employee_ids,
-            "CurrencyId": currency_ids,
-            "ContractTypeMainCode": contract_types,
-            "EmployeeContractStartDate": contract_start_dates,
-            "EmployeeContractEndDate": contract_end_dates,
-            "PayGroupCode": pay_group_codes,
-            "Salary": salaries,
-            "FullTimeEquivalent": full_time_equiv,
-            "CostCenterId": cost_center_ids,
-            "IsAnnex": is_annex,
-            "CalendarDateValidFor": calendar_date_valid_for
-        })
+    def generate_dim_employee_contract(
+        self,
+        dim_employee_df: pl.DataFrame,
+        first_contract_id: int = 1,
+        history_end: date = HISTORY_END
+    ) -> pl.DataFrame:
+        num_employees = len(dim_employee_df)
+        # frames reduced to their key columns carry no employment dates, so those employees get a random hire date
+        if "HireDate" in dim_employee_df.columns:
+            starts = from_key(dim_employee_df["HireDate"].to_numpy())
+        else:
+            starts = random_dates(self.rng, date(2010, 1, 1), date(2023, 12, 31), num_employees)
+        terminations = None
+        if "TerminationDate" in dim_employee_df.columns:
+            termination_keys = dim_employee_df["TerminationDate"]
+            terminations = np.where(
+                termination_keys.is_null().to_numpy(), np.datetime64("NaT"), from_key(termination_keys.fill_null(19700101).to_numpy())
+            )
+
+        history = build_contract_history(
+            self.rng, starts, terminations, self.contracts_per_employee, self.annexes_per_contract, history_end
+        )
+        num_contracts = int(history["ContractIdx"].max()) + 1 if len(history) else 0
+        num_rows = len(history)
+
+        contracts = history.select(
+            (pl.col("ContractIdx") + first_contract_id).alias("EmployeeContractId"),
+            dim_employee_df["EmployeeSourceId"].gather(history["EmployeeIdx"]).alias("EmployeeId"),
+            pl.lit("EUR", dtype=CURRENCY).alias("CurrencyId"),
+            pl.col("ContractType").alias("ContractTypeMainCode"),
+            pl.col("ContractStartDate").alias("EmployeeContractStartDate"),
+            pl.col("ContractEndDate").alias("EmployeeContractEndDate"),
+            self.sample_values("PayGroupCode", num_contracts).gather(history["ContractIdx"]),
+            pl.col("Salary"),
+            pl.col("FullTimeEquivalent"),
+            dim_employee_df["CostCenterId"].gather(history["EmployeeIdx"]),
+            pl.col("IsAnnex"),
+            pl.Series("CalendarDateValidFor", to_key(random_dates(self.rng, date(2025, 1, 1), date(2025, 12, 31), num_rows))),
+            pl.col("ValidFrom"),
+            pl.col("ValidTo"),
+        )
+        return conform(contracts, "DimEmployeeContract")
 
     def save_df_to_csv(self, df: pl.DataFrame, country: str, table_name: str):
-        df.write_csv(f"./src/data/output/{country}/PAYROLL_AMR_{country}001_{table_name}_D{datetime.now().strftime('%Y%m%d')}.csv", separator=";")
+        to_legacy_csv(df).write_csv(OutputConfig().file_path(country, table_name), separator=";")
 
+    def save_df(self, df: pl.DataFrame, country: str, table_name: str, output: OutputConfig, part: Optional[int] = None) -> List[str]:
+        return write_table(df, output, country, table_name, part)
 
-    def _random_dates(self, start: datetime, end: datetime) -> list:
-        return [
-            next(self.generate_dates(start_date=start, end_date=end))[0]
-            for _ in range(self.rows_amt)
-        ]
+    def _generate_termination(self, rows_amt: int):
+        is_terminated = self.rng.random(rows_amt) < 0.25
+        dates = to_key(random_dates(self.rng, date(2024, 1, 1), date(2025, 12, 31), rows_amt))
+        reasons = self.sample_values("TerminationReasonCode", rows_amt, drop_nulls=True)
 
-    def _generate_termination(self):
-        is_terminated = [random.random() < 0.25 for _ in range(self.rows_amt)]
-        reason_pool = list(
-            self.extract_list_of_random_values_from_file("TerminationReasonCode")
-        )
+        return key_series("TerminationDate", dates, is_terminated), reasons.scatter(np.flatnonzero(~is_terminated), None)
 
-        dates, reasons = [], []
-
-        for terminated in is_terminated:
-            if terminated:
-                dates.append(
-                    next(
-                        self.generate_dates(
-                            start_date=datetime(2024, 1, 1),
-                            end_date=datetime(2025, 12, 31)
-                        )
-                    )[0]
-                )
-                reasons.append(random.choice(reason_pool))
-            else:
-                dates.append(None)
-                reasons.append(None)
-
-        return dates, reasons
-
-    def _generate_positions_and_levels(self):
-        positions = [
-            random.choice(["Intern", "Contractor", "Employee", "Manager"])
-            for _ in range(self.rows_amt)
-        ]
-
-        position_to_level = {
-            "Intern": 1,
-            "Contractor": 2,
-            "Employee": 3,
-            "Manager": 4
-        }
-
-        return positions, [position_to_level[p] for p in positions]
-
-    def _generate_departments(self, positions: list):
-        lvl1, lvl2 = [], []
-
-        for pos in positions:
-            if random.random() < 0.25:
-                lvl1.append("RST")
-                lvl2.append("RST")
-            else:
-                lvl1.append("OPS")
-                lvl2.append("OPS Manager" if pos == "Manager" else "OPS Crew")
-
-        return lvl1, lvl2
-
-    def _generate_supervision(self, employee_ids, names, positions):
-        positions = positions.copy()
-
-        indices = [random.choice(range(self.rows_amt)) for _ in range(self.rows_amt)]
-
-        for idx in set(indices):
-            positions[idx] = "Manager"
-
-        ids = [employee_ids[i] for i in indices]
-        fn, mn, ln = names
-
-        full = [
-            f"{f} {m + ' ' if m else ''}{l}"
-            for f, m, l in zip(
-                [fn[i] for i in indices],
-                [mn[i] for i in indices],
-                [ln[i] for i in indices]
-            )
-        ]
-
-        return (
-            ids,
-            [fn[i] for i in indices],
-            [mn[i] for i in indices],
-            [ln[i] for i in indices],
-            full,
-            positions,
-        )
-        
+    def _random_flags(self, rows_amt: int, share: float = 0.2) -> pl.Series:
+        # most employees leave these flags empty
+        values = self.rng.integers(0, 2, size=rows_amt, dtype=np.uint8)
+        return pl.Series(values, dtype=FLAG).scatter(np.flatnonzero(self.rng.random(rows_amt) >= share), None)
+
+    def _generate_positions_and_levels(self, rows_amt: int, is_manager: np.ndarray):
+        drawn = self.rng.choice(np.array(list(POSITION_LEVELS)), size=rows_amt)
+        # anyone with reports is a manager, the rest keep the position they drew
+        positions = pl.Series(np.where(is_manager, "Manager", drawn))
+        return positions, positions.replace_strict(POSITION_LEVELS, return_dtype=pl.UInt8)
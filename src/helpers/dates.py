@@ -0,0 +1,66 @@
+from datetime import date
+from typing import Optional, Tuple
+
+import numpy as np
+import polars as pl
+
+from helpers.schemas import DATE_KEY
+
+
+DAY = np.timedelta64(1, "D")
+OPEN_END_KEY = 99991231
+
+
+def random_dates(rng: np.random.Generator, start: date, end: date, size: int) -> np.ndarray:
+    offsets = rng.integers(0, (end - start).days + 1, size=size)
+    return np.datetime64(start, "D") + offsets.astype("timedelta64[D]")
+
+
+def month_bounds(year: int, month: int, months_count: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    starts = np.datetime64(f"{year:04d}-{month:02d}", "M") + np.arange(months_count)
+    return starts.astype("datetime64[D]"), (starts + 1).astype("datetime64[D]") - DAY
+
+
+def random_dates_in_month(rng: np.random.Generator, year: int, month: int, size: int) -> np.ndarray:
+    starts, ends = month_bounds(year, month)
+    return random_dates(rng, starts[0].item(), ends[0].item(), size)
+
+
+def to_key(dates: np.ndarray) -> np.ndarray:
+    days = dates.astype("datetime64[D]").astype(np.int64)
+    if days.size == 0:
+        return days.astype(np.int32)
+    # dates span a few decades at most, so convert each distinct day once and gather
+    first = days.min()
+    calendar_days = np.arange(first, days.max() + 1).astype("datetime64[D]")
+    months = calendar_days.astype("datetime64[M]")
+    years = calendar_days.astype("datetime64[Y]").astype(np.int64) + 1970
+    keys = years * 10000 + (months.astype(np.int64) % 12 + 1) * 100 + (calendar_days - months).astype(np.int64) + 1
+    return keys.astype(np.int32)[days - first]
+
+
+def from_key(keys: np.ndarray) -> np.ndarray:
+    keys = np.asarray(keys, dtype=np.int64)
+    months = ((keys // 10000 - 1970) * 12 + keys // 100 % 100 - 1).astype("datetime64[M]")
+    return months.astype("datetime64[D]") + (keys % 100 - 1).astype("timedelta64[D]")
+
+
+def today_key() -> int:
+    return int(to_key(np.array([np.datetime64(date.today(), "D")]))[0])
+
+
+def payroll_periods(year: int, month: int, months_count: int) -> np.ndarray:
+    starts, ends = month_bounds(year, month, months_count)
+    payroll_numbers = to_key(starts) // 100
+    return np.column_stack([to_key(starts), to_key(ends), to_key(ends - DAY), payroll_numbers])
+
+
+def working_days(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    return np.busday_count(starts, ends + DAY)
+
+
+def key_series(name: str, keys: np.ndarray, mask: Optional[np.ndarray] = None) -> pl.Series:
+    series = pl.Series(name, keys, dtype=DATE_KEY)
+    if mask is None:
+        return series
+    return series.scatter(np.flatnonzero(~mask), None)
@@ -0,0 +1,114 @@
+from abc import ABC, abstractmethod
+from itertools import chain
+from threading import Lock
+from typing import IO, TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Tuple, Union
+import os
+
+import polars as pl
+
+from helpers.tables import TableSpec
+
+if TYPE_CHECKING:
+    import pyarrow
+
+
+DEFAULT_BATCH_ROWS = 100_000
+STREAM_EXTENSION = ".arrows"
+
+
+class ArrowConsumer(ABC):
+    def __init__(self, batch_rows: int = DEFAULT_BATCH_ROWS):
+        self.batch_rows = batch_rows
+
+    @abstractmethod
+    def consume(self, country: str, table: str, frames: Iterable[pl.DataFrame]) -> List[str]:
+        ...
+
+
+class CallbackConsumer(ArrowConsumer):
+    def __init__(self, callback: Callable[[str, str, "pyarrow.RecordBatch"], None], batch_rows: int = DEFAULT_BATCH_ROWS):
+        super().__init__(batch_rows)
+        self.callback = callback
+        self._lock = Lock()
+
+    def consume(self, country: str, table: str, frames: Iterable[pl.DataFrame]) -> List[str]:
+        _, batches = record_batches(frames, self.batch_rows)
+        # scheduled runs deliver tables from several threads, the callback sees them one at a time
+        with self._lock:
+            for batch in batches:
+                self.callback(country, table, batch)
+        return []
+
+
+class DuckDBConsumer(ArrowConsumer):
+    def __init__(self, connection, view_name: str = "{table}", batch_rows: int = DEFAULT_BATCH_ROWS):
+        super().__init__(batch_rows)
+        self.connection = connection
+        self.view_name = view_name
+        self.tables: Dict[str, "pyarrow.Table"] = {}
+        self._lock = Lock()
+
+    def consume(self, country: str, table: str, frames: Iterable[pl.DataFrame]) -> List[str]:
+        schema, batches = record_batches(frames, self.batch_rows)
+        arrow_table = _pyarrow().Table.from_batches(list(batches), schema=schema)
+        name = self.view_name.format(country=country, table=table)
+
+        # duckdb scans the registered arrow buffers in place, so the table is kept alive for as long as the view
+        with self._lock:
+            self.tables[name] = arrow_table
+            self.connection.register(name, arrow_table)
+        return [name]
+
+
+class IpcStreamConsumer(ArrowConsumer):
+    def __init__(self, target: Union[str, Callable[[str, str], IO[bytes]]], batch_rows: int = DEFAULT_BATCH_ROWS):
+        super().__init__(batch_rows)
+        self.target = target
+
+    def consume(self, country: str, table: str, frames: Iterable[pl.DataFrame]) -> List[str]:
+        schema, batches = record_batches(frames, self.batch_rows)
+        name, sink = self._open(country, table)
+        with sink, _pyarrow().ipc.new_stream(sink, schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+        return [name]
+
+    def _open(self, country: str, table: str) -> Tuple[str, IO[bytes]]:
+        if callable(self.target):
+            return f"{country}/{table}", self.target(country, table)
+
+        # an existing named pipe is opened like a file, so a reader on the other end gets the stream as it is written
+        path = os.path.join(self.target, country, f"{table}{STREAM_EXTENSION}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path, open(path, "wb")
+
+
+def record_batches(frames: Iterable[pl.DataFrame], batch_rows: int = DEFAULT_BATCH_ROWS) -> Tuple["pyarrow.Schema", Iterator["pyarrow.RecordBatch"]]:
+    _pyarrow()
+    frames = iter(frames)
+    first = next(frames, None)
+    if first is None:
+        raise ValueError("Nothing to deliver")
+
+    def batches() -> Iterator["pyarrow.RecordBatch"]:
+        for frame in chain([first], frames):
+            # slices share the frame's buffers; at the newest compat level strings stay string views, so to_arrow hands
+            # them over without copying the values
+            for chunk in frame.iter_slices(batch_rows):
+                yield from chunk.to_arrow(compat_level=pl.CompatLevel.newest()).to_batches()
+
+    return first.head(0).to_arrow(compat_level=pl.CompatLevel.newest()).schema, batches()
+
+
+def deliver_table_result(spec: TableSpec, country: str, consumer: ArrowConsumer, inputs: Dict[str, pl.DataFrame]) -> List[str]:
+    return consumer.consume(country, spec.table, [inputs[spec.table]])
+
+
+def _pyarrow():
+    # pyarrow is only needed, and only imported, when a run delivers its tables in memory
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError:
+        raise ImportError("Arrow delivery requires the pyarrow package") from None
+    return pyarrow
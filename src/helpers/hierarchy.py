@@ -0,0 +1,106 @@
+from dataclasses import dataclass
+from typing import List, Sequence
+
+import numpy as np
+import polars as pl
+
+
+DEFAULT_SPAN_OF_CONTROL = 8
+DEFAULT_MAX_DEPTH = 10
+DEPARTMENT_LEVELS = 5
+TOP_DEPARTMENTS = ("OPS", "RST", "FIN", "HR", "IT", "LOG", "SAL", "MKT")
+
+
+@dataclass(frozen=True)
+class OrgHierarchy:
+    supervisor_idx: pl.Series
+    is_manager: np.ndarray
+    departments: pl.DataFrame
+
+
+def level_sizes(rows_amt: int, top_units: int, span_of_control: int, max_depth: int) -> List[int]:
+    sizes = []
+    remaining = rows_amt
+    size = min(top_units, rows_amt)
+    while remaining > 0:
+        # the deepest allowed level takes everyone left, widening its managers' spans
+        size = remaining if len(sizes) == max_depth - 1 else min(size, remaining)
+        sizes.append(size)
+        remaining -= size
+        size *= span_of_control
+    return sizes
+
+
+def build_hierarchy(
+    rng: np.random.Generator,
+    rows_amt: int,
+    span_of_control: int = DEFAULT_SPAN_OF_CONTROL,
+    max_depth: int = DEFAULT_MAX_DEPTH,
+    top_departments: Sequence[str] = TOP_DEPARTMENTS
+) -> OrgHierarchy:
+    # the top level only has one unit per department, everyone else has to fit in the levels below it
+    if max_depth < 2:
+        raise ValueError("An org hierarchy needs a max_depth of at least 2")
+
+    sizes = level_sizes(rows_amt, len(top_departments), span_of_control, max_depth)
+    starts = np.concatenate([[0], np.cumsum(sizes)])
+
+    # nodes are numbered breadth first, so every parent precedes its children and each level is a contiguous range
+    parent = np.full(rows_amt, -1, dtype=np.int64)
+    depth = np.zeros(rows_amt, dtype=np.int64)
+    for level in range(1, len(sizes)):
+        above, size = sizes[level - 1], sizes[level]
+        nodes = slice(starts[level], starts[level + 1])
+        parent[nodes] = starts[level - 1] + np.arange(size) * above // size
+        depth[nodes] = level
+
+    has_reports = np.zeros(rows_amt, dtype=bool)
+    has_reports[parent[parent >= 0]] = True
+    # individual contributors belong to the team their supervisor heads
+    team = np.where(has_reports | (parent < 0), np.arange(rows_amt), parent)
+
+    # tree positions are dealt out to rows at random, so the structure does not follow employee ids
+    rows = rng.permutation(rows_amt)
+    position = np.empty(rows_amt, dtype=np.int64)
+    position[rows] = np.arange(rows_amt)
+
+    codes = _unit_codes(parent, starts, sizes, top_departments)
+    row_team = team[position]
+    departments = {}
+    for level in range(DEPARTMENT_LEVELS):
+        if level < len(sizes):
+            unit = _ancestor_at(parent, depth, starts, sizes, level)[row_team]
+            departments[f"DepartmentLvl{level + 1}"] = codes.gather(np.maximum(unit, 0)).scatter(np.flatnonzero(unit < 0), None)
+        else:
+            departments[f"DepartmentLvl{level + 1}"] = pl.Series([None] * rows_amt, dtype=pl.Utf8)
+
+    supervisor_position = parent[position]
+    supervisor_row = rows[np.maximum(supervisor_position, 0)] if rows_amt else supervisor_position
+    supervisor_idx = pl.Series("SupervisorIdx", supervisor_row).scatter(np.flatnonzero(supervisor_position < 0), None)
+
+    return OrgHierarchy(
+        supervisor_idx=supervisor_idx,
+        is_manager=has_reports[position],
+        departments=pl.DataFrame(departments),
+    )
+
+
+def _ancestor_at(parent: np.ndarray, depth: np.ndarray, starts: np.ndarray, sizes: List[int], level: int) -> np.ndarray:
+    ancestor = np.where(depth == level, np.arange(len(parent)), -1)
+    for below in range(level + 1, len(sizes)):
+        nodes = slice(starts[below], starts[below + 1])
+        ancestor[nodes] = ancestor[parent[nodes]]
+    return ancestor
+
+
+def _unit_codes(parent: np.ndarray, starts: np.ndarray, sizes: List[int], top_departments: Sequence[str]) -> pl.Series:
+    # units are named by their path from the top department, e.g. OPS-3-1
+    codes = pl.Series("Code", list(top_departments[:sizes[0] if sizes else 0]), dtype=pl.Utf8)
+    for level in range(1, min(len(sizes), DEPARTMENT_LEVELS)):
+        nodes = np.arange(starts[level], starts[level + 1])
+        parents = parent[nodes]
+        is_first = np.ones(len(nodes), dtype=bool)
+        is_first[1:] = parents[1:] != parents[:-1]
+        ordinal = np.arange(len(nodes)) - np.maximum.accumulate(np.where(is_first, np.arange(len(nodes)), 0)) + 1
+        codes = codes.append(codes.gather(parents) + "-" + pl.Series(ordinal).cast(pl.Utf8))
+    return codes
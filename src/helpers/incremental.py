@@ -0,0 +1,186 @@
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+import json
+import os
+
+import polars as pl
+
+from helpers.data_manager import DataManager
+from helpers.dates import OPEN_END_KEY, month_bounds, random_dates_in_month, to_key, today_key
+from helpers.tables import DIM_EMPLOYEE, DIM_EMPLOYEE_CONTRACT, TableSpec, derive_seed
+from helpers.writers import OutputConfig, write_table
+
+
+MANIFEST_FILE = "manifest.json"
+STATE_DIR = "_state"
+
+
+@dataclass
+class RunManifest:
+    country: str
+    employee_id_high_water: Optional[int] = None
+    contract_id_high_water: int = 0
+    dim_employee_rows: int = 0
+    periods: List[int] = field(default_factory=list)
+    payroll_periods: List[int] = field(default_factory=list)
+    outputs: Dict[str, List[str]] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: str, country: str) -> "RunManifest":
+        if not os.path.exists(path):
+            return cls(country)
+        with open(path) as f:
+            return cls(**json.load(f))
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(asdict(self), f, indent=2)
+        os.replace(tmp_path, path)
+
+
+def state_paths(output: OutputConfig, country: str) -> Dict[str, str]:
+    country_dir = os.path.join(output.root, country)
+    return {
+        "manifest": os.path.join(country_dir, MANIFEST_FILE),
+        "dim_employee": os.path.join(country_dir, STATE_DIR, f"{DIM_EMPLOYEE}.parquet"),
+        "open_contracts": os.path.join(country_dir, STATE_DIR, f"{DIM_EMPLOYEE_CONTRACT}.parquet"),
+    }
+
+
+def period_file_name(spec: TableSpec, period: int) -> str:
+    return f"{spec.file_name}_P{period}"
+
+
+def run_month(
+    country: str,
+    tables: List[TableSpec],
+    year: int,
+    month: int,
+    output: OutputConfig,
+    initial_rows: int,
+    new_hires: int,
+    termination_rate: float,
+    seed: Optional[int] = None
+) -> RunManifest:
+    paths = state_paths(output, country)
+    manifest = RunManifest.load(paths["manifest"], country)
+    period = year * 100 + month
+
+    if period in manifest.periods:
+        raise ValueError(f"{country} {period} was already generated")
+    if manifest.periods and period < max(manifest.periods):
+        raise ValueError(f"{country} {period} is older than the last generated period {max(manifest.periods)}")
+
+    specs = {spec.table: spec for spec in tables}
+    if DIM_EMPLOYEE not in specs:
+        raise ValueError(f"{DIM_EMPLOYEE} is required for an incremental run")
+    dim_spec = specs[DIM_EMPLOYEE]
+    dm = DataManager(dim_spec.src_path, new_hires, derive_seed(seed, DIM_EMPLOYEE, period))
+
+    if manifest.employee_id_high_water is None:
+        first_id = dm.source_lookup().max("EmployeeSourceId") + 1
+        hires = dm.generate_dim_employee(list(range(first_id, first_id + initial_rows)))
+        dim_employee, changed = hires, hires.clear()
+    else:
+        first_id = manifest.employee_id_high_water + 1
+        stored = pl.read_parquet(paths["dim_employee"])
+        hires = _as_new_hires(dm, dm.generate_dim_employee(list(range(first_id, first_id + new_hires))), year, month)
+        changed = _terminate(dm, stored, year, month, termination_rate)
+        dim_employee = pl.concat(
+            [stored.update(changed, on="EmployeeSourceId"), hires],
+            how="vertical_relaxed"
+        )
+
+    outputs = {}
+    dim_delta = pl.concat([changed, hires], how="vertical_relaxed")
+    outputs[dim_spec.file_name] = write_table(dim_delta, output, country, period_file_name(dim_spec, period))
+
+    open_contracts = pl.read_parquet(paths["open_contracts"]) if os.path.exists(paths["open_contracts"]) else None
+    active = _active_in_month(dim_employee, year, month)
+    for spec in tables:
+        if spec.table == DIM_EMPLOYEE:
+            continue
+
+        if spec.table == DIM_EMPLOYEE_CONTRACT:
+            # contracts are only opened for this month's hires, continuing the contract id sequence. their history stops
+            # at the end of the month, so a termination in a later month always falls inside the open version
+            table_dm = DataManager(spec.src_path, len(hires), derive_seed(seed, spec.table, period))
+            opened = table_dm.generate_dim_employee_contract(
+                hires, first_contract_id=manifest.contract_id_high_water + 1, history_end=month_bounds(year, month)[1][0].item()
+            )
+            manifest.contract_id_high_water += opened["EmployeeContractId"].n_unique()
+            closed, open_contracts = _close_contracts(opened.clear() if open_contracts is None else open_contracts, dim_employee)
+            open_contracts = pl.concat([open_contracts, opened.filter(pl.col("ValidTo") == OPEN_END_KEY)])
+            df = pl.concat([closed, opened])
+        else:
+            table_dm = DataManager(spec.src_path, len(active), derive_seed(seed, spec.table, period))
+            df = table_dm.generate_fact_table(
+                spec.table, active, year, month, lookup_path=spec.src_path, payroll_months=1
+            )
+        outputs[spec.file_name] = write_table(df, output, country, period_file_name(spec, period))
+
+    os.makedirs(os.path.dirname(paths["dim_employee"]), exist_ok=True)
+    dim_employee.write_parquet(paths["dim_employee"])
+    if open_contracts is not None:
+        open_contracts.write_parquet(paths["open_contracts"])
+
+    manifest.employee_id_high_water = int(dim_employee["EmployeeSourceId"].max())
+    manifest.dim_employee_rows = len(dim_employee)
+    manifest.periods.append(period)
+    if "FactEmployeePayroll" in specs:
+        manifest.payroll_periods.append(period)
+    manifest.outputs[str(period)] = [path for table_paths in outputs.values() for path in table_paths]
+    manifest.save(paths["manifest"])
+
+    return manifest
+
+
+def _as_new_hires(dm: DataManager, hires: pl.DataFrame, year: int, month: int) -> pl.DataFrame:
+    return hires.with_columns(
+        pl.Series("HireDate", to_key(random_dates_in_month(dm.rng, year, month, len(hires))), dtype=hires.schema["HireDate"]),
+        pl.lit(None).cast(hires.schema["TerminationDate"]).alias("TerminationDate"),
+        pl.lit(None).cast(hires.schema["TerminationReasonCode"]).alias("TerminationReasonCode"),
+        pl.lit(1).cast(hires.schema["IsWorking"]).alias("IsWorking"),
+    )
+
+
+def _terminate(dm: DataManager, dim_employee: pl.DataFrame, year: int, month: int, termination_rate: float) -> pl.DataFrame:
+    working = dim_employee.filter(pl.col("TerminationDate").is_null())
+    leavers = working.filter(pl.Series(dm.rng.random(len(working)) < termination_rate))
+    if leavers.is_empty():
+        return leavers
+
+    termination_dates = to_key(random_dates_in_month(dm.rng, year, month, len(leavers)))
+
+    return leavers.with_columns(
+        pl.Series("TerminationDate", termination_dates).cast(dim_employee.schema["TerminationDate"]),
+        dm.sample_values("TerminationReasonCode", len(leavers), drop_nulls=True)
+            .cast(dim_employee.schema["TerminationReasonCode"]),
+        pl.Series("IsWorking", termination_dates > today_key()).cast(dim_employee.schema["IsWorking"]),
+    )
+
+
+def _close_contracts(open_contracts: pl.DataFrame, dim_employee: pl.DataFrame) -> Tuple[pl.DataFrame, pl.DataFrame]:
+    # the open version of a leaver is written again ending on the termination date, everyone else's stays open
+    terminations = open_contracts.select("EmployeeId").join(
+        dim_employee.select(pl.col("EmployeeSourceId").cast(open_contracts.schema["EmployeeId"]).alias("EmployeeId"), "TerminationDate"),
+        on="EmployeeId",
+        how="left",
+        maintain_order="left"
+    )["TerminationDate"]
+    is_closed = terminations.is_not_null()
+
+    closed = open_contracts.filter(is_closed).with_columns(
+        terminations.filter(is_closed).cast(open_contracts.schema["ValidTo"]).alias("ValidTo"),
+        terminations.filter(is_closed).cast(open_contracts.schema["EmployeeContractEndDate"]).alias("EmployeeContractEndDate"),
+    )
+    return closed, open_contracts.filter(~is_closed)
+
+
+def _active_in_month(dim_employee: pl.DataFrame, year: int, month: int) -> pl.DataFrame:
+    month_start = year * 10000 + month * 100 + 1
+    return dim_employee.filter(
+        pl.col("TerminationDate").is_null() | (pl.col("TerminationDate").cast(pl.Int64) >= month_start)
+    )
@@ -0,0 +1,206 @@
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from threading import Event, Lock, Thread, local
+from typing import Callable, Dict, Iterator, List, Optional
+import cProfile
+import json
+import os
+import time
+
+from helpers.lookup_cache import LOOKUP_CACHE
+
+
+PROFILERS = (None, "cprofile", "pyinstrument")
+RSS_SAMPLE_SECONDS = 0.01
+
+
+@dataclass
+class StepMetrics:
+    name: str
+    parent: Optional[str] = None
+    started_at: Optional[str] = None
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    rows: Optional[int] = None
+    bytes_written: int = 0
+    source_reads: int = 0
+    peak_rss_mb: Optional[float] = None
+    profile_path: Optional[str] = None
+    paths: List[str] = field(default_factory=list)
+
+    @property
+    def path(self) -> str:
+        return self.name if self.parent is None else f"{self.parent}/{self.name}"
+
+    def add_output(self, paths: List[str]):
+        for path in paths:
+            self.paths.append(path)
+            self.bytes_written += _size(path)
+
+
+StageHook = Callable[[str, StepMetrics], None]
+
+
+class Instrumentation:
+    def __init__(
+        self,
+        enabled: bool = True,
+        hooks: Optional[List[StageHook]] = None,
+        report_path: Optional[str] = None,
+        profiler: Optional[str] = None,
+        profile_dir: str = "."
+    ):
+        if profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler: {profiler}")
+
+        self.enabled = enabled
+        self.hooks = list(hooks or [])
+        self.report_path = report_path
+        self.profiler = profiler
+        self.profile_dir = profile_dir
+        self.steps: List[StepMetrics] = []
+        self._local = local()
+        self._lock = Lock()
+        self._rss = RssSampler()
+
+    @property
+    def _stack(self) -> List[StepMetrics]:
+        # stages running on scheduler threads nest independently of each other
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def add_hook(self, hook: StageHook):
+        self.hooks.append(hook)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StepMetrics]:
+        if not self.enabled:
+            yield StepMetrics(name)
+            return
+
+        parent = self._stack[-1] if self._stack else None
+        step = StepMetrics(name, parent.path if parent else None, datetime.now().isoformat(timespec="seconds"))
+        self._stack.append(step)
+        self._emit("start", step)
+
+        profiler = self._start_profiler() if parent is None else None
+        reads_before = LOOKUP_CACHE.thread_reads
+        self._rss.watch(step)
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        try:
+            yield step
+        finally:
+            step.wall_seconds = round(time.perf_counter() - start_wall, 6)
+            step.cpu_seconds = round(time.process_time() - start_cpu, 6)
+            step.source_reads = LOOKUP_CACHE.thread_reads - reads_before
+            self._rss.release(step)
+            if profiler is not None:
+                step.profile_path = self._stop_profiler(profiler, step)
+            if parent is not None:
+                parent.add_output(step.paths)
+
+            self._stack.pop()
+            with self._lock:
+                self.steps.append(step)
+                self._emit("end", step)
+                if parent is None and self.report_path:
+                    self.write_report(self.report_path)
+
+    def report(self) -> dict:
+        return {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "steps": [dict(asdict(step), path=step.path) for step in self.steps],
+        }
+
+    def write_report(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def _emit(self, event: str, step: StepMetrics):
+        for hook in self.hooks:
+            hook(event, step)
+
+    def _start_profiler(self):
+        if self.profiler == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+            return profiler
+        if self.profiler == "pyinstrument":
+            from pyinstrument import Profiler
+
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+        return None
+
+    def _stop_profiler(self, profiler, step: StepMetrics) -> str:
+        os.makedirs(self.profile_dir, exist_ok=True)
+        if self.profiler == "cprofile":
+            profiler.disable()
+            path = os.path.join(self.profile_dir, f"{step.name}.prof")
+            profiler.dump_stats(path)
+        else:
+            profiler.stop()
+            path = os.path.join(self.profile_dir, f"{step.name}.html")
+            with open(path, "w") as f:
+                f.write(profiler.output_html())
+        return path
+
+
+class RssSampler:
+    def __init__(self, interval: float = RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self._steps: Dict[int, StepMetrics] = {}
+        self._stop: Optional[Event] = None
+        self._lock = Lock()
+
+    def watch(self, step: StepMetrics):
+        # the process lifetime peak would carry an earlier stage's high-water mark, so RSS is sampled while steps run
+        with self._lock:
+            step.peak_rss_mb = _rss_mb()
+            self._steps[id(step)] = step
+            if self._stop is None:
+                self._stop = Event()
+                Thread(target=self._run, args=(self._stop,), daemon=True).start()
+
+    def release(self, step: StepMetrics):
+        with self._lock:
+            self._sample([step])
+            del self._steps[id(step)]
+            if not self._steps:
+                self._stop.set()
+                self._stop = None
+
+    def _run(self, stop: Event):
+        while not stop.wait(self.interval):
+            with self._lock:
+                self._sample(self._steps.values())
+
+    @staticmethod
+    def _sample(steps):
+        rss = _rss_mb()
+        if rss is None:
+            return
+        for step in steps:
+            step.peak_rss_mb = rss if step.peak_rss_mb is None else max(step.peak_rss_mb, rss)
+
+
+NO_INSTRUMENTATION = Instrumentation(enabled=False)
+
+
+def _rss_mb() -> Optional[float]:
+    # resident pages from /proc, only available on Linux; elsewhere stages report no memory figure
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024, 1)
+
+
+def _size(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(_size(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path) if os.path.exists(path) else 0
@@ -0,0 +1,56 @@
+from typing import Sequence
+
+import numpy as np
+import polars as pl
+
+from helpers.dates import month_bounds, to_key, working_days
+
+
+INTERVALS_PER_EMPLOYEE = (0, 1, 2)
+INTERVALS_WEIGHTS = (0.25, 0.5, 0.25)
+
+
+def generate_intervals(
+    rng: np.random.Generator,
+    employee_ids: pl.Series,
+    year: int,
+    month: int,
+    max_duration: int,
+    counts: Sequence[int] = INTERVALS_PER_EMPLOYEE,
+    weights: Sequence[float] = INTERVALS_WEIGHTS
+) -> pl.DataFrame:
+    num_employees = len(employee_ids)
+    per_employee = rng.choice(np.asarray(counts), size=num_employees, p=np.asarray(weights))
+    num_candidates = int(per_employee.sum())
+
+    month_start, month_end = month_bounds(year, month)
+    employee_idx = np.repeat(np.arange(num_employees), per_employee)
+    start_offsets = rng.integers(0, (month_end - month_start)[0].astype(int) + 1, size=num_candidates)
+    durations = rng.integers(1, max_duration + 1, size=num_candidates)
+
+    order = np.lexsort((start_offsets, employee_idx))
+    employee_idx, start_offsets, durations = employee_idx[order], start_offsets[order], durations[order]
+    end_offsets = start_offsets + durations - 1
+
+    # an interval is kept when it starts after the last kept interval of the same employee ends, so candidates are
+    # settled one position at a time across all employees at once; counts are small, so this is only a few passes
+    first = np.cumsum(per_employee) - per_employee
+    position = np.arange(num_candidates) - first[employee_idx]
+    last_end = np.full(num_employees, -1, dtype=end_offsets.dtype)
+    keep = np.zeros(num_candidates, dtype=bool)
+    for k in range(int(position.max(initial=-1)) + 1):
+        rows = np.flatnonzero(position == k)
+        is_free = start_offsets[rows] > last_end[employee_idx[rows]]
+        keep[rows] = is_free
+        last_end[employee_idx[rows[is_free]]] = end_offsets[rows[is_free]]
+
+    starts = month_start + start_offsets[keep].astype("timedelta64[D]")
+    ends = month_start + end_offsets[keep].astype("timedelta64[D]")
+
+    return pl.DataFrame({
+        "EmployeeId": employee_ids.gather(employee_idx[keep]),
+        "StartDate": to_key(starts),
+        "EndDate": to_key(ends),
+        "Days": durations[keep],
+        "WorkingDays": working_days(starts, ends),
+    })
@@ -0,0 +1,107 @@
+from typing import Callable, Iterator, List, Optional, Union
+
+import polars as pl
+from polars.io.plugins import register_io_source
+
+from helpers.data_manager import DataManager
+from helpers.pools import DEFAULT_LOCALE
+from helpers.schemas import SCHEMAS
+from helpers.tables import DIM_EMPLOYEE, DIM_EMPLOYEE_CONTRACT, DIM_EMPLOYEE_KEY_COLUMNS, derive_seed
+
+
+DEFAULT_BATCH_ROWS = 100_000
+
+BatchFactory = Callable[[], Iterator[pl.DataFrame]]
+
+
+def scan_dim_employee(
+    src_path: str,
+    rows_amt: int,
+    seed: Optional[int] = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    locale: str = DEFAULT_LOCALE
+) -> pl.LazyFrame:
+    def batches() -> Iterator[pl.DataFrame]:
+        return DataManager(src_path, rows_amt, seed, locale).generate_dim_employee_chunks(batch_rows)
+
+    return _generated_source(DIM_EMPLOYEE, batches, seed is not None)
+
+
+def scan_fact_table(
+    fact_name: str,
+    src_path: str,
+    dim_employee: Union[pl.DataFrame, pl.LazyFrame],
+    year: int,
+    month: int,
+    seed: Optional[int] = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    payroll_months: Optional[int] = None,
+    locale: str = DEFAULT_LOCALE
+) -> pl.LazyFrame:
+    def batches() -> Iterator[pl.DataFrame]:
+        for index, chunk in enumerate(_fixed_batches(dim_employee, DIM_EMPLOYEE_KEY_COLUMNS, batch_rows)):
+            dm = DataManager(src_path, len(chunk), derive_seed(seed, fact_name, index), locale)
+            yield dm.generate_fact_table(fact_name, chunk, year, month, lookup_path=src_path, payroll_months=payroll_months)
+
+    return _generated_source(fact_name, batches, seed is not None)
+
+
+def scan_dim_employee_contract(
+    src_path: str,
+    dim_employee: Union[pl.DataFrame, pl.LazyFrame],
+    seed: Optional[int] = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    first_contract_id: int = 1,
+    locale: str = DEFAULT_LOCALE
+) -> pl.LazyFrame:
+    def batches() -> Iterator[pl.DataFrame]:
+        next_contract_id = first_contract_id
+        for index, chunk in enumerate(_fixed_batches(dim_employee, DIM_EMPLOYEE_KEY_COLUMNS, batch_rows)):
+            dm = DataManager(src_path, len(chunk), derive_seed(seed, DIM_EMPLOYEE_CONTRACT, index), locale)
+            contracts = dm.generate_dim_employee_contract(chunk, first_contract_id=next_contract_id)
+            yield contracts
+            next_contract_id += contracts["EmployeeContractId"].n_unique()
+
+    return _generated_source(DIM_EMPLOYEE_CONTRACT, batches, seed is not None)
+
+
+def _generated_source(table: str, batches: BatchFactory, is_pure: bool) -> pl.LazyFrame:
+    def source(
+        with_columns: Optional[List[str]],
+        predicate: Optional[pl.Expr],
+        n_rows: Optional[int],
+        batch_size: Optional[int]
+    ) -> Iterator[pl.DataFrame]:
+        remaining = n_rows
+        # every collect starts a fresh generator, so a seeded source yields the same rows each time
+        for df in batches():
+            if predicate is not None:
+                df = df.filter(predicate)
+            if with_columns is not None:
+                df = df.select(with_columns)
+            if remaining is not None:
+                df = df.head(remaining)
+                remaining -= len(df)
+            yield df
+            if remaining == 0:
+                return
+
+    return register_io_source(source, schema=SCHEMAS[table], is_pure=is_pure)
+
+
+def _fixed_batches(frame: Union[pl.DataFrame, pl.LazyFrame], columns: List[str], batch_rows: int) -> Iterator[pl.DataFrame]:
+    # the engine picks its own batch sizes, re-chunk them so a seeded batch always covers the same employees
+    pending: List[pl.DataFrame] = []
+    pending_rows = 0
+
+    for batch in frame.lazy().select(columns).collect_batches():
+        pending.append(batch)
+        pending_rows += len(batch)
+        while pending_rows >= batch_rows:
+            buffered = pl.concat(pending)
+            yield buffered.head(batch_rows)
+            pending = [buffered.slice(batch_rows)]
+            pending_rows -= batch_rows
+
+    if pending_rows:
+        yield pl.concat(pending)
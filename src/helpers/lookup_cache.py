@@ -0,0 +1,184 @@
+from collections import OrderedDict
+from threading import Lock, local
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import os
+
+import polars as pl
+
+from helpers.profiles import PROFILE_DIR, SourceProfile, load_or_build_profile
+from helpers.sampling import EMPIRICAL, Sampler
+
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class SourceLookup:
+    def __init__(
+        self,
+        path: str,
+        mtime_ns: int,
+        scan: Callable[[], pl.LazyFrame],
+        profile: Optional[SourceProfile] = None,
+        cache: Optional["LookupCache"] = None
+    ):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.profile = profile
+        self.max_values: Dict[str, object] = dict(profile.max_values) if profile is not None else {}
+        self.samplers: Dict[Tuple[Tuple[str, ...], str, bool], Sampler] = {}
+        self.nbytes = 0
+        self._scan = scan
+        self._source: Optional[pl.LazyFrame] = None
+        self._cache = cache
+        self._lock = Lock()
+        self.columns: List[str] = profile.columns if profile is not None else self.source.collect_schema().names()
+
+    @property
+    def source(self) -> pl.LazyFrame:
+        # with a profile at hand most lookups never touch the file, so only scan it when one does
+        if self._source is None:
+            self._source = self._scan()
+        return self._source
+
+    def value_counts(self, col_names: Sequence[str]) -> pl.DataFrame:
+        for col_name in col_names:
+            self._check_column(col_name)
+
+        if self.profile is not None:
+            counts = self.profile.value_counts(col_names)
+            if counts is not None:
+                return counts
+
+        counts = self.source.group_by(col_names, maintain_order=True).agg(pl.len().alias("count")).collect()
+        if self._cache is not None:
+            self._cache.record_read(grown=False)
+        # column combinations are not known up front, so they join the stored profile once first asked for
+        if self.profile is not None and len(col_names) > 1 and self.profile.add_group(counts):
+            if self._cache is not None and self._cache.profile_dir is not None:
+                self.profile.save(self._cache.profile_dir)
+        return counts
+
+    def sampler(self, col_names: Sequence[str], mode: str = EMPIRICAL, drop_nulls: bool = False) -> Sampler:
+        key = (tuple(col_names), mode, drop_nulls)
+
+        with self._lock:
+            sampler = self.samplers.get(key)
+            grown = sampler is None
+            if grown:
+                counts = self.value_counts(col_names)
+                sampler = Sampler.from_counts(counts.drop_nulls() if drop_nulls else counts, mode)
+                self.samplers[key] = sampler
+                self.nbytes += sampler.nbytes
+
+        if grown and self._cache is not None:
+            self._cache.record_read(grown=True, read=False)
+        return sampler
+
+    def max(self, col_name: str):
+        self._check_column(col_name)
+
+        with self._lock:
+            read = col_name not in self.max_values
+            if read:
+                self.max_values[col_name] = self.source.select(pl.col(col_name).max()).collect().item()
+
+        if read and self._cache is not None:
+            self._cache.record_read(grown=False)
+        return self.max_values[col_name]
+
+    def _check_column(self, col_name: str):
+        if col_name not in self.columns:
+            raise KeyError(f"Column {col_name} not found in {self.path}")
+
+
+class LookupCache:
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, profile_dir: Optional[str] = PROFILE_DIR):
+        self.max_bytes = max_bytes
+        self.profile_dir = profile_dir
+        self.loads = 0
+        self.profiled = 0
+        self.reads = 0
+        self.hits = 0
+        self._entries: "OrderedDict[Tuple[str, int], SourceLookup]" = OrderedDict()
+        self._lock = Lock()
+        self._local = local()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(entry.nbytes for entry in self._entries.values())
+
+    @property
+    def thread_reads(self) -> int:
+        # scheduled stages each run on one thread, so this counts a stage's own reads and not its neighbours'
+        return getattr(self._local, "reads", 0)
+
+    def get(self, path: str, scan: Callable[[], pl.LazyFrame]) -> SourceLookup:
+        key = self._key(path)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        # a profile reads the whole file, which only pays off when it is kept for later runs
+        if self.profile_dir is not None:
+            profile, built = load_or_build_profile(key[0], os.stat(key[0]), scan, self.profile_dir)
+        else:
+            profile, built = None, False
+        entry = SourceLookup(key[0], key[1], scan, profile=profile, cache=self)
+
+        with self._lock:
+            self.loads += 1
+            if built:
+                self.profiled += 1
+                self._count_read()
+            for stale in [k for k in self._entries if k[0] == key[0]]:
+                del self._entries[stale]
+            self._entries[key] = entry
+
+        return entry
+
+    def resize(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def record_read(self, grown: bool, read: bool = True):
+        with self._lock:
+            if read:
+                self._count_read()
+            if grown:
+                self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _count_read(self):
+        self.reads += 1
+        self._local.reads = self.thread_reads + 1
+
+    def _evict(self):
+        total = sum(entry.nbytes for entry in self._entries.values())
+        while self._entries and total > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            total -= evicted.nbytes
+
+    @staticmethod
+    def _key(path: str) -> Tuple[str, int]:
+        abs_path = os.path.abspath(path)
+        return abs_path, os.stat(abs_path).st_mtime_ns
+
+
+LOOKUP_CACHE = LookupCache(
+    int(os.environ.get("PREPARE_DATASET_LOOKUP_CACHE_BYTES", DEFAULT_MAX_BYTES)),
+    None if os.environ.get("PREPARE_DATASET_PROFILES") == "0" else PROFILE_DIR
+)
+
+
+def configure_lookup_cache(max_bytes: Optional[int] = None) -> LookupCache:
+    if max_bytes is not None:
+        LOOKUP_CACHE.resize(max_bytes)
+    return LOOKUP_CACHE
@@ -0,0 +1,125 @@
+from threading import Lock
+from typing import Dict, Optional, Sequence, Tuple
+import os
+
+import numpy as np
+import polars as pl
+
+
+DEFAULT_LOCALE = "en_US"
+MIDDLE_NAME_SHARE = 0.2
+CACHE_DIR = os.environ.get(
+    "PREPARE_DATASET_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "prepare-dataset")
+)
+
+
+class IdentityPools:
+    def __init__(self, locale: str, pools: pl.DataFrame):
+        self.locale = locale
+        self.frame = pools
+        self.values: Dict[str, pl.Series] = {}
+        self.weights: Dict[str, Optional[np.ndarray]] = {}
+
+        for (name,), group in pools.partition_by("pool", as_dict=True, maintain_order=True).items():
+            self.values[name] = group["value"]
+            weights = group["weight"].to_numpy()
+            self.weights[name] = None if np.all(weights == weights[0]) else weights / weights.sum()
+
+    @classmethod
+    def build(cls, locale: str = DEFAULT_LOCALE) -> "IdentityPools":
+        from faker import Faker
+        import pycountry
+
+        person = next(
+            provider for provider in Faker(locale).providers
+            if hasattr(provider, "first_names") and hasattr(provider, "last_names")
+        )
+        countries = list(pycountry.countries)
+
+        frames = [
+            _pool_frame("first_name", *_names_with_weights(person.first_names)),
+            _pool_frame("last_name", *_names_with_weights(person.last_names)),
+            _pool_frame("country_code", [c.alpha_2.upper() for c in countries]),
+            _pool_frame("country_name", [c.name for c in countries]),
+        ]
+        return cls(locale, pl.concat(frames))
+
+    @classmethod
+    def load(cls, locale: str = DEFAULT_LOCALE, cache_dir: Optional[str] = CACHE_DIR) -> "IdentityPools":
+        if cache_dir is None:
+            return cls.build(locale)
+
+        path = os.path.join(cache_dir, f"identity_pools_{locale}_{_source_versions()}.parquet")
+        if os.path.exists(path):
+            return cls(locale, pl.read_parquet(path))
+
+        pools = cls.build(locale)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            pools.frame.write_parquet(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+        return pools
+
+    def sample(self, pool: str, rng: np.random.Generator, size: int) -> pl.Series:
+        values = self.values[pool]
+        return values.gather(rng.choice(len(values), size=size, p=self.weights[pool]))
+
+    def sample_names(self, rng: np.random.Generator, size: int) -> pl.DataFrame:
+        return pl.DataFrame({
+            "FirstName": self.sample("first_name", rng, size),
+            "MiddleName": self.sample("first_name", rng, size),
+            "LastName": self.sample("last_name", rng, size),
+            "HasMiddleName": rng.random(size) < MIDDLE_NAME_SHARE,
+        }).select(
+            pl.col("FirstName"),
+            pl.when(pl.col("HasMiddleName")).then(pl.col("MiddleName")).otherwise(pl.lit("")).alias("MiddleName"),
+            pl.col("LastName"),
+        )
+
+
+def full_name(first: pl.Expr, middle: pl.Expr, last: pl.Expr) -> pl.Expr:
+    return pl.concat_str([
+        first,
+        pl.when(middle != "").then(pl.lit(" ") + middle).otherwise(pl.lit("")),
+        pl.lit(" "),
+        last,
+    ])
+
+
+def work_email(first: pl.Expr, last: pl.Expr) -> pl.Expr:
+    return pl.concat_str([first, pl.lit("."), last, pl.lit("@workmail.com")]).str.to_uppercase()
+
+
+_POOLS: Dict[str, IdentityPools] = {}
+_POOLS_LOCK = Lock()
+
+
+def get_identity_pools(locale: str = DEFAULT_LOCALE) -> IdentityPools:
+    with _POOLS_LOCK:
+        if locale not in _POOLS:
+            _POOLS[locale] = IdentityPools.load(locale)
+        return _POOLS[locale]
+
+
+def _names_with_weights(names) -> Tuple[Sequence[str], Optional[Sequence[float]]]:
+    if isinstance(names, dict):
+        return [name.upper() for name in names.keys()], list(names.values())
+    return [name.upper() for name in names], None
+
+
+def _pool_frame(pool: str, values: Sequence[str], weights: Optional[Sequence[float]] = None) -> pl.DataFrame:
+    return pl.DataFrame({
+        "pool": [pool] * len(values),
+        "value": list(values),
+        "weight": [1.0] * len(values) if weights is None else [float(w) for w in weights],
+    })
+
+
+def _source_versions() -> str:
+    from importlib.metadata import version
+
+    return f"faker{version('faker')}_pycountry{version('pycountry')}"
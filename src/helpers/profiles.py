@@ -0,0 +1,132 @@
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import hashlib
+import json
+import os
+
+import polars as pl
+
+from helpers.pools import CACHE_DIR
+
+
+PROFILE_VERSION = 1
+PROFILE_DIR = os.path.join(CACHE_DIR, "profiles")
+MAX_PROFILED_DISTINCT = 10_000
+PROFILED_DTYPES = {str(dtype): dtype for dtype in (pl.Int64, pl.Int32, pl.Float64, pl.String, pl.Boolean)}
+
+
+@dataclass
+class SourceProfile:
+    path: str
+    size: int
+    mtime_ns: int
+    columns: List[str]
+    dtypes: Dict[str, str]
+    max_values: Dict[str, Any] = field(default_factory=dict)
+    # column -> (distinct values in order of first appearance, how often each occurs)
+    distinct: Dict[str, Tuple[list, List[int]]] = field(default_factory=dict)
+    # "ColA,ColB" -> (distinct combinations by column, how often each occurs)
+    groups: Dict[str, Tuple[Dict[str, list], List[int]]] = field(default_factory=dict)
+    version: int = PROFILE_VERSION
+
+    @classmethod
+    def build(cls, path: str, stat: os.stat_result, source: pl.LazyFrame) -> "SourceProfile":
+        schema = source.collect_schema()
+        numeric = [name for name, dtype in schema.items() if dtype.is_numeric()]
+        # a profile reads every column, so the streaming engine keeps that to a few batches of the file at a time and
+        # a cardinality estimate rules out id and amount columns without holding all of their values
+        stats = source.select(
+            [pl.col(name).approx_n_unique().alias(f"n_unique:{name}") for name in schema.names()]
+            + [pl.col(name).max().alias(f"max:{name}") for name in numeric]
+        ).collect(engine="streaming").row(0, named=True)
+
+        candidates = [
+            name for name, dtype in schema.items()
+            if str(dtype) in PROFILED_DTYPES and stats[f"n_unique:{name}"] <= 2 * MAX_PROFILED_DISTINCT
+        ]
+        frequencies = pl.collect_all([
+            source.group_by(name, maintain_order=True).agg(pl.len().alias("count")) for name in candidates
+        ], engine="streaming")
+        profiled = [(name, frame) for name, frame in zip(candidates, frequencies) if frame.height <= MAX_PROFILED_DISTINCT]
+
+        return cls(
+            path=path,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            columns=schema.names(),
+            dtypes={name: str(dtype) for name, dtype in schema.items()},
+            max_values={name: stats[f"max:{name}"] for name in numeric},
+            distinct={
+                name: (frame[name].to_list(), frame["count"].to_list())
+                for name, frame in profiled
+            },
+        )
+
+    @classmethod
+    def load(cls, path: str, stat: os.stat_result, profile_dir: str) -> Optional["SourceProfile"]:
+        try:
+            with open(profile_path(path, profile_dir)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # any change to the source, or to what a profile holds, invalidates it
+        if (data.get("version"), data.get("size"), data.get("mtime_ns")) != (PROFILE_VERSION, stat.st_size, stat.st_mtime_ns):
+            return None
+        return cls(**data)
+
+    def save(self, profile_dir: str):
+        path = profile_path(self.path, profile_dir)
+        try:
+            os.makedirs(profile_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(asdict(self), f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def has_distinct(self, col_name: str) -> bool:
+        return col_name in self.distinct
+
+    def value_counts(self, columns: Sequence[str]) -> Optional[pl.DataFrame]:
+        if len(columns) == 1 and self.has_distinct(columns[0]):
+            values, counts = {columns[0]: self.distinct[columns[0]][0]}, self.distinct[columns[0]][1]
+        elif ",".join(columns) in self.groups:
+            values, counts = self.groups[",".join(columns)]
+        else:
+            return None
+
+        return pl.DataFrame(
+            [pl.Series(name, values[name], dtype=PROFILED_DTYPES[self.dtypes[name]]) for name in columns]
+            + [pl.Series("count", counts, dtype=pl.UInt32)]
+        )
+
+    def add_group(self, counts: pl.DataFrame) -> bool:
+        columns = [name for name in counts.columns if name != "count"]
+        if counts.height > MAX_PROFILED_DISTINCT or any(self.dtypes[name] not in PROFILED_DTYPES for name in columns):
+            return False
+        self.groups[",".join(columns)] = ({name: counts[name].to_list() for name in columns}, counts["count"].to_list())
+        return True
+
+
+def profile_path(path: str, profile_dir: str) -> str:
+    digest = hashlib.sha1(path.encode()).hexdigest()[:16]
+    return os.path.join(profile_dir, f"{os.path.basename(path)}.{digest}.json")
+
+
+def load_or_build_profile(
+    path: str,
+    stat: os.stat_result,
+    scan: Callable[[], pl.LazyFrame],
+    profile_dir: Optional[str] = PROFILE_DIR
+) -> Tuple[SourceProfile, bool]:
+    if profile_dir is not None:
+        profile = SourceProfile.load(path, stat, profile_dir)
+        if profile is not None:
+            return profile, False
+
+    profile = SourceProfile.build(path, stat, scan())
+    if profile_dir is not None:
+        profile.save(profile_dir)
+    return profile, True
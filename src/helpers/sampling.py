@@ -0,0 +1,72 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import polars as pl
+
+
+UNIFORM = "uniform"
+EMPIRICAL = "empirical"
+SAMPLING_MODES = (UNIFORM, EMPIRICAL)
+
+
+@dataclass(frozen=True)
+class AliasTable:
+    prob: np.ndarray
+    alias: np.ndarray
+
+    @classmethod
+    def build(cls, weights: np.ndarray) -> "AliasTable":
+        weights = np.asarray(weights, dtype=np.float64)
+        total = weights.sum()
+        if len(weights) == 0 or total <= 0:
+            raise ValueError("An alias table needs at least one positive weight")
+
+        # Vose's method: every slot holds its own value with probability prob and its alias otherwise
+        scaled = weights * len(weights) / total
+        prob = np.ones(len(weights))
+        alias = np.arange(len(weights))
+        small = list(np.flatnonzero(scaled < 1))
+        large = list(np.flatnonzero(scaled >= 1))
+        while small and large:
+            short, tall = small.pop(), large.pop()
+            prob[short] = scaled[short]
+            alias[short] = tall
+            scaled[tall] -= 1 - scaled[short]
+            (small if scaled[tall] < 1 else large).append(tall)
+
+        return cls(prob, alias)
+
+    @property
+    def nbytes(self) -> int:
+        return self.prob.nbytes + self.alias.nbytes
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        slots = rng.integers(0, len(self.prob), size=size)
+        return np.where(rng.random(size) < self.prob[slots], slots, self.alias[slots])
+
+
+@dataclass(frozen=True)
+class Sampler:
+    rows: pl.DataFrame
+    table: Optional[AliasTable] = None
+
+    @classmethod
+    def from_counts(cls, counts: pl.DataFrame, mode: str = EMPIRICAL) -> "Sampler":
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode: {mode}")
+        rows = counts.drop("count")
+        return cls(rows, AliasTable.build(counts["count"].to_numpy()) if mode == EMPIRICAL else None)
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.estimated_size() + (self.table.nbytes if self.table is not None else 0)
+
+    def sample_index(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        if self.table is None:
+            return rng.integers(0, self.rows.height, size=size)
+        return self.table.sample(rng, size)
+
+    def sample(self, rng: np.random.Generator, size: int) -> pl.DataFrame:
+        # correlated columns are drawn together by row, so every sampled combination exists in the source
+        return self.rows.select(pl.all().gather(self.sample_index(rng, size)))
@@ -0,0 +1,151 @@
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import multiprocessing
+import time
+
+
+EXECUTORS = ("thread", "process")
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    run: Callable[[Dict[str, Any]], Any]
+    depends_on: Tuple[str, ...] = ()
+    keep_result: bool = True
+
+
+@dataclass(frozen=True)
+class StageTiming:
+    name: str
+    started: float
+    finished: float
+
+    @property
+    def seconds(self) -> float:
+        return self.finished - self.started
+
+
+@dataclass
+class ScheduleReport:
+    wall_seconds: float
+    timings: Dict[str, StageTiming]
+    results: Dict[str, Any] = field(repr=False)
+    critical_path: List[str]
+
+    @property
+    def critical_path_seconds(self) -> float:
+        return sum(self.timings[name].seconds for name in self.critical_path)
+
+    def to_dict(self) -> dict:
+        return {
+            "wall_seconds": round(self.wall_seconds, 6),
+            "critical_path": self.critical_path,
+            "critical_path_seconds": round(self.critical_path_seconds, 6),
+            "stages": {
+                name: {"started": round(t.started, 6), "finished": round(t.finished, 6), "seconds": round(t.seconds, 6)}
+                for name, t in self.timings.items()
+            },
+        }
+
+
+class Scheduler:
+    def __init__(self, max_workers: Optional[int] = None, executor: str = "thread"):
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor: {executor}")
+        self.max_workers = max_workers
+        self.executor = executor
+
+    def run(self, stages: List[Stage]) -> ScheduleReport:
+        by_name = self._validate(stages)
+        pending = dict(by_name)
+        running: Dict[Future, str] = {}
+        results: Dict[str, Any] = {}
+        finished_at: Dict[str, Tuple[float, float]] = {}
+        waiting = {name: 0 for name in by_name}
+        for stage in stages:
+            for dep in stage.depends_on:
+                waiting[dep] += 1
+        origin = time.time()
+
+        with self._executor() as pool:
+            try:
+                while pending or running:
+                    for name in [n for n, s in pending.items() if all(d in finished_at for d in s.depends_on)]:
+                        stage = pending.pop(name)
+                        inputs = {dep: results[dep] for dep in stage.depends_on}
+                        running[pool.submit(_timed, stage.run, inputs)] = name
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        results[name], started, finished = future.result()
+                        finished_at[name] = (started - origin, finished - origin)
+                        for dep in by_name[name].depends_on:
+                            waiting[dep] -= 1
+                        # a result nobody keeps is released as soon as the last stage that reads it is done
+                        for released in (name, *by_name[name].depends_on):
+                            if not waiting[released] and not by_name[released].keep_result:
+                                results.pop(released, None)
+            except BaseException:
+                for future in running:
+                    future.cancel()
+                raise
+
+        timings = {name: StageTiming(name, *span) for name, span in finished_at.items()}
+        return ScheduleReport(time.time() - origin, timings, results, self._critical_path(by_name, timings))
+
+    def _executor(self) -> Executor:
+        if self.executor == "process":
+            return ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return ThreadPoolExecutor(self.max_workers)
+
+    @staticmethod
+    def _validate(stages: List[Stage]) -> Dict[str, Stage]:
+        by_name = {}
+        for stage in stages:
+            if stage.name in by_name:
+                raise ValueError(f"Duplicate stage: {stage.name}")
+            by_name[stage.name] = stage
+
+        for stage in stages:
+            for dep in stage.depends_on:
+                if dep not in by_name:
+                    raise ValueError(f"{stage.name} depends on unknown stage {dep}")
+
+        visiting, done = set(), set()
+
+        def visit(name: str):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through {name}")
+            visiting.add(name)
+            for dep in by_name[name].depends_on:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in by_name:
+            visit(name)
+        return by_name
+
+    @staticmethod
+    def _critical_path(stages: Dict[str, Stage], timings: Dict[str, StageTiming]) -> List[str]:
+        if not timings:
+            return []
+
+        # walk back from the last stage to finish through whichever dependency released it
+        name = max(timings, key=lambda n: timings[n].finished)
+        path = [name]
+        while stages[name].depends_on:
+            name = max(stages[name].depends_on, key=lambda n: timings[n].finished)
+            path.append(name)
+        return path[::-1]
+
+
+def _timed(run: Callable[[Dict[str, Any]], Any], inputs: Dict[str, Any]) -> Tuple[Any, float, float]:
+    started = time.time()
+    result = run(inputs)
+    return result, started, time.time()
@@ -0,0 +1,128 @@
+from typing import Dict, TypeVar
+
+import polars as pl
+
+
+SIGNED_AMOUNT_COLUMNS = ["PayoutAmount", "PayoutAmountEuro", "HoursAmount"]
+
+POSITION = pl.Enum(["Intern", "Contractor", "Employee", "Manager"])
+CURRENCY = pl.Enum(["EUR"])
+CONTRACT_TYPE = pl.Enum(["Fijo", "Temporal"])
+CODE = pl.Categorical()
+FLAG = pl.UInt8
+DATE_KEY = pl.Int32
+
+SCHEMAS: Dict[str, pl.Schema] = {
+    "DimEmployee": pl.Schema({
+        "EmployeeSourceId": pl.Int64,
+        "FirstName": pl.Utf8,
+        "MiddleName": pl.Utf8,
+        "LastName": pl.Utf8,
+        "FullName": pl.Utf8,
+        "WorkEmail": pl.Utf8,
+        "NationalId": CODE,
+        "Citizenship": CODE,
+        "BirthDate": DATE_KEY,
+        "Sex": FLAG,
+        "IsWorking": FLAG,
+        "IsOnAbsence": FLAG,
+        "IsSuspended": FLAG,
+        "IsStudent": FLAG,
+        "IsJuvenile": FLAG,
+        "HasDisability": FLAG,
+        "HireDate": DATE_KEY,
+        "TerminationDate": DATE_KEY,
+        "TerminationReasonCode": CODE,
+        "Position": POSITION,
+        "Level": pl.UInt8,
+        "SupervisorId": pl.Int64,
+        "SupervisorFirstName": pl.Utf8,
+        "SupervisorMiddleName": pl.Utf8,
+        "SupervisorLastName": pl.Utf8,
+        "SupervisorFullName": pl.Utf8,
+        "CostCenterId": CODE,
+        "Localization": CODE,
+        "EmployeeGroupId": CODE,
+        "EmployeeGroupName": CODE,
+        "DepartmentLvl1": CODE,
+        "DepartmentLvl2": CODE,
+        "DepartmentLvl3": CODE,
+        "DepartmentLvl4": CODE,
+        "DepartmentLvl5": CODE,
+        "SeniorityDays": pl.Int32,
+    }),
+    "DimEmployeeContract": pl.Schema({
+        "EmployeeContractId": pl.Int64,
+        "EmployeeId": pl.Int64,
+        "CurrencyId": CURRENCY,
+        "ContractTypeMainCode": CONTRACT_TYPE,
+        "EmployeeContractStartDate": DATE_KEY,
+        "EmployeeContractEndDate": DATE_KEY,
+        "PayGroupCode": CODE,
+        "Salary": pl.Float64,
+        "FullTimeEquivalent": pl.UInt8,
+        "CostCenterId": CODE,
+        "IsAnnex": FLAG,
+        "CalendarDateValidFor": DATE_KEY,
+        "ValidFrom": DATE_KEY,
+        "ValidTo": DATE_KEY,
+    }),
+    "FactEmployeePayroll": pl.Schema({
+        "EmployeeId": pl.Int64,
+        "CostCenterId": CODE,
+        "WageComponentCode": CODE,
+        "PayGroupCode": CODE,
+        "PayoutStartDate": DATE_KEY,
+        "PayoutEndDate": DATE_KEY,
+        "PayrollDate": DATE_KEY,
+        "PayrollNumber": pl.Int32,
+        "PayoutAmount": pl.Float64,
+        "PayoutAmountEuro": pl.Float64,
+        "CurrencyCode": CURRENCY,
+        "HoursAmount": pl.Float64,
+    }),
+    "FactEmployeeAbsence": pl.Schema({
+        "EmployeeId": pl.Int64,
+        "AbsenceCode": CODE,
+        "StartDate": DATE_KEY,
+        "EndDate": DATE_KEY,
+        "Days": pl.Float64,
+        "WorkingDays": pl.Float64,
+        "WorkingHours": pl.Float64,
+    }),
+    "FactEmployeeDisability": pl.Schema({
+        "EmployeeId": pl.Int64,
+        "DisabilityId": pl.UInt8,
+        "StartDate": DATE_KEY,
+        "EndDate": DATE_KEY,
+    }),
+}
+
+
+def conform(df: pl.DataFrame, table: str) -> pl.DataFrame:
+    schema = SCHEMAS[table]
+    return df.select([_cast(pl.col(name), dtype) for name, dtype in schema.items()])
+
+
+def _cast(col: pl.Expr, dtype: pl.DataType) -> pl.Expr:
+    # source extracts may read codes as integers, which polars only turns into categories by way of text
+    if dtype == CODE:
+        return col.cast(pl.Utf8).cast(dtype)
+    return col.cast(dtype)
+
+
+Frame = TypeVar("Frame", pl.DataFrame, pl.LazyFrame)
+
+
+def to_legacy_csv(df: Frame) -> Frame:
+    # SAP extracts carry the sign after the number, e.g. "120.5-"; everything else the csv writer renders as before
+    schema = df.collect_schema()
+    return df.with_columns([
+        signed_amount_text(pl.col(name)).alias(name)
+        for name in SIGNED_AMOUNT_COLUMNS
+        if schema.get(name) == pl.Float64
+    ])
+
+
+def signed_amount_text(col: pl.Expr) -> pl.Expr:
+    return pl.when(col < 0).then(col.abs().cast(pl.Utf8) + "-").otherwise(col.cast(pl.Utf8))
@@ -0,0 +1,97 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import repeat
+from typing import Dict, List, Optional
+import multiprocessing
+
+from helpers.data_manager import DataManager
+from helpers.tables import DIM_EMPLOYEE, TableSpec, derive_seed, generate_table
+from helpers.writers import OutputConfig, merge_csv_parts, write_table
+
+
+DEFAULT_SHARD_ROWS = 100_000
+
+
+@dataclass(frozen=True)
+class Shard:
+    index: int
+    offset: int
+    first_employee_id: int
+    rows_amt: int
+    seed: Optional[int]
+
+
+def plan_shards(first_employee_id: int, rows_amt: int, shard_rows: int, seed: Optional[int]) -> List[Shard]:
+    # shard boundaries depend only on shard_rows, never on the worker count, so a seeded run is reproducible
+    return [
+        Shard(
+            index=index,
+            offset=offset,
+            first_employee_id=first_employee_id + offset,
+            rows_amt=min(shard_rows, rows_amt - offset),
+            seed=derive_seed(seed, index)
+        )
+        for index, offset in enumerate(range(0, rows_amt, shard_rows))
+    ]
+
+
+def run_shard(country: str, shard: Shard, tables: List[TableSpec], year: int, month: int, output: OutputConfig) -> Dict[str, List[str]]:
+    employee_ids = list(range(shard.first_employee_id, shard.first_employee_id + shard.rows_amt))
+    results = {}
+    outputs = {}
+
+    # dimension first, then every table that references it, all within this shard's employee range;
+    # every employee owns a block of contract ids large enough for their longest possible history
+    for spec in sorted(tables, key=lambda t: t.table != DIM_EMPLOYEE):
+        results[spec.table] = generate_table(
+            spec, shard.rows_amt, year, month, derive_seed(shard.seed, spec.table), results,
+            employee_ids=employee_ids, first_contract_id=shard.offset * DataManager.contracts_per_employee[1] + 1
+        )
+        outputs[spec.file_name] = write_table(results[spec.table], output, country, spec.file_name, part=shard.index)
+
+    return outputs
+
+
+def run_sharded(
+    country: str,
+    tables: List[TableSpec],
+    rows_amt: int,
+    year: int,
+    month: int,
+    workers: Optional[int] = None,
+    seed: Optional[int] = None,
+    shard_rows: int = DEFAULT_SHARD_ROWS,
+    merge: bool = True,
+    output: Optional[OutputConfig] = None
+) -> Dict[str, List[str]]:
+    output = output or OutputConfig()
+    dim_spec = _dim_employee_spec(tables)
+    first_employee_id = DataManager(dim_spec.src_path, rows_amt).source_lookup().max("EmployeeSourceId") + 1
+    shards = plan_shards(first_employee_id, rows_amt, shard_rows, seed)
+
+    # polars keeps its own thread pool, which is not fork-safe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        results = list(pool.map(
+            run_shard, repeat(country), shards, repeat(tables), repeat(year), repeat(month), repeat(output)
+        ))
+
+    outputs = {}
+    for spec in tables:
+        part_paths = [path for result in results for path in result[spec.file_name]]
+        csv_part_paths = [output.file_path(country, spec.file_name, shard.index) for shard in shards]
+        # parquet/ipc and partitioned shards already form a dataset directory, only single CSV files are stitched together
+        if merge and output.format == "csv" and part_paths == csv_part_paths:
+            target_path = output.file_path(country, spec.file_name)
+            merge_csv_parts(part_paths, target_path, output.compression)
+            outputs[spec.file_name] = [target_path]
+        else:
+            outputs[spec.file_name] = part_paths
+
+    return outputs
+
+
+def _dim_employee_spec(tables: List[TableSpec]) -> TableSpec:
+    for spec in tables:
+        if spec.table == DIM_EMPLOYEE:
+            return spec
+    raise ValueError(f"{DIM_EMPLOYEE} is required for a sharded run")
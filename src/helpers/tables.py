@@ -0,0 +1,88 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import zlib
+
+import numpy as np
+import polars as pl
+
+from helpers.data_manager import DataManager
+from helpers.pools import DEFAULT_LOCALE
+from helpers.writers import OutputConfig, write_table
+
+
+DIM_EMPLOYEE = "DimEmployee"
+DIM_EMPLOYEE_CONTRACT = "DimEmployeeContract"
+# the DimEmployee columns contracts and facts are generated from
+DIM_EMPLOYEE_KEY_COLUMNS = ["EmployeeSourceId", "CostCenterId", "HireDate", "TerminationDate"]
+FACT_TABLES = ("FactEmployeePayroll", "FactEmployeeAbsence", "FactEmployeeDisability")
+TABLE_DEPENDENCIES: Dict[str, Tuple[str, ...]] = {
+    DIM_EMPLOYEE: (),
+    DIM_EMPLOYEE_CONTRACT: (DIM_EMPLOYEE,),
+    **{fact: (DIM_EMPLOYEE,) for fact in FACT_TABLES},
+}
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    table: str
+    src_path: str
+    file_name: str
+    depends_on: Optional[Tuple[str, ...]] = None
+
+    def __post_init__(self):
+        if self.table not in TABLE_DEPENDENCIES:
+            raise ValueError(f"Unknown table: {self.table}")
+        if self.depends_on is None:
+            object.__setattr__(self, "depends_on", TABLE_DEPENDENCIES[self.table])
+
+
+def derive_seed(seed: Optional[int], *keys) -> Optional[int]:
+    if seed is None:
+        return None
+
+    entropy = [seed] + [zlib.crc32(str(key).encode()) for key in keys]
+    return int(np.random.SeedSequence(entropy).generate_state(1)[0])
+
+
+def generate_table(
+    spec: TableSpec,
+    rows_amt: int,
+    year: int,
+    month: int,
+    seed: Optional[int],
+    inputs: Dict[str, pl.DataFrame],
+    employee_ids: Optional[List[int]] = None,
+    first_contract_id: int = 1,
+    locale: str = DEFAULT_LOCALE
+) -> pl.DataFrame:
+    if spec.table == DIM_EMPLOYEE:
+        return DataManager(spec.src_path, rows_amt, seed, locale).generate_dim_employee(employee_ids)
+
+    dim_employee = inputs[spec.depends_on[0]]
+    dm = DataManager(spec.src_path, len(dim_employee), seed, locale)
+
+    if spec.table == DIM_EMPLOYEE_CONTRACT:
+        return dm.generate_dim_employee_contract(dim_employee, first_contract_id=first_contract_id)
+    return dm.generate_fact_table(spec.table, dim_employee, year, month, lookup_path=spec.src_path)
+
+
+def run_table(
+    spec: TableSpec,
+    country: str,
+    rows_amt: int,
+    year: int,
+    month: int,
+    seed: Optional[int],
+    output: Optional[OutputConfig],
+    keep_result: bool,
+    inputs: Dict[str, pl.DataFrame],
+    locale: str = DEFAULT_LOCALE
+) -> Optional[pl.DataFrame]:
+    df = generate_table(spec, rows_amt, year, month, derive_seed(seed, spec.table), inputs, locale=locale)
+    if output is not None:
+        write_table(df, output, country, spec.file_name)
+    return df if keep_result else None
+
+
+def write_table_result(spec: TableSpec, country: str, output: OutputConfig, inputs: Dict[str, pl.DataFrame]) -> List[str]:
+    return write_table(inputs[spec.table], output, country, spec.file_name)
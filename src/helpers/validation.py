@@ -0,0 +1,128 @@
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+import json
+
+import polars as pl
+
+from helpers.schemas import SCHEMAS
+from helpers.tables import DIM_EMPLOYEE, TableSpec
+from helpers.writers import OutputConfig, scan_table, table_files
+
+
+SAMPLE_ROWS = 5
+INTERVAL_TABLES = ("FactEmployeeAbsence", "FactEmployeeDisability")
+REFERENCING_TABLES = ("DimEmployeeContract", "FactEmployeePayroll", "FactEmployeeAbsence", "FactEmployeeDisability")
+
+
+@dataclass
+class CheckResult:
+    check: str
+    table: str
+    violations: int
+    sample: List[dict] = field(default_factory=list)
+
+    @property
+    def passed(self) -> bool:
+        return self.violations == 0
+
+
+@dataclass
+class ValidationReport:
+    country: str
+    checks: List[CheckResult] = field(default_factory=list)
+
+    @property
+    def passed(self) -> bool:
+        return all(check.passed for check in self.checks)
+
+    def failures(self) -> List[CheckResult]:
+        return [check for check in self.checks if not check.passed]
+
+    def to_dict(self) -> dict:
+        return {
+            "country": self.country,
+            "passed": self.passed,
+            "checks": [dict(asdict(check), passed=check.passed) for check in self.checks],
+        }
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+
+
+def validate_outputs(
+    country: str,
+    tables: List[TableSpec],
+    output: Optional[OutputConfig] = None,
+    sample_rows: int = SAMPLE_ROWS,
+    run_date: Optional[str] = None
+) -> ValidationReport:
+    output = output or OutputConfig()
+    frames: Dict[str, pl.LazyFrame] = {}
+    report = ValidationReport(country)
+
+    for spec in tables:
+        paths = table_files(output, country, spec.file_name, run_date)
+        if not paths:
+            report.checks.append(CheckResult("exists", spec.table, 1, [{"file_name": spec.file_name}]))
+            continue
+        frames[spec.table] = scan_table(output, paths)
+        report.checks.append(_check_columns(spec.table, frames[spec.table]))
+
+    dim_employee = frames.get(DIM_EMPLOYEE)
+    if dim_employee is not None:
+        # one id column is small next to the tables it is joined with, so it is read once instead of once per check
+        employee_ids = dim_employee.select(pl.col("EmployeeSourceId").alias("EmployeeId")).collect(engine="streaming").lazy()
+        for table in REFERENCING_TABLES:
+            if table in frames:
+                orphans = frames[table].select("EmployeeId").join(employee_ids, on="EmployeeId", how="anti")
+                report.checks.append(_violations("employee_exists", table, orphans, sample_rows))
+
+        unresolved = (
+            dim_employee.select("EmployeeSourceId", "SupervisorId")
+                .filter(pl.col("SupervisorId").is_not_null())
+                .join(employee_ids, left_on="SupervisorId", right_on="EmployeeId", how="anti")
+        )
+        report.checks.append(_violations("supervisor_exists", DIM_EMPLOYEE, unresolved, sample_rows))
+
+    for table in INTERVAL_TABLES:
+        if table in frames:
+            report.checks.append(_violations("intervals_disjoint", table, _overlaps(frames[table]), sample_rows))
+
+    if "FactEmployeePayroll" in frames:
+        duplicates = (
+            frames["FactEmployeePayroll"]
+                .group_by("EmployeeId", "PayoutStartDate")
+                .agg(pl.len().alias("Rows"))
+                .filter(pl.col("Rows") > 1)
+        )
+        report.checks.append(_violations("payroll_dates_unique", "FactEmployeePayroll", duplicates, sample_rows))
+
+    return report
+
+
+def _check_columns(table: str, frame: pl.LazyFrame) -> CheckResult:
+    expected = SCHEMAS[table].names()
+    actual = frame.collect_schema().names()
+    mismatches = [{"missing": name} for name in expected if name not in actual]
+    mismatches += [{"unexpected": name} for name in actual if name not in expected]
+    return CheckResult("columns", table, len(mismatches), mismatches)
+
+
+def _overlaps(frame: pl.LazyFrame) -> pl.LazyFrame:
+    # once sorted by start, an interval overlaps an earlier one exactly when it starts before the previous one ends
+    return (
+        frame.select("EmployeeId", "StartDate", "EndDate")
+            .sort("EmployeeId", "StartDate")
+            .with_columns(
+                pl.col("EmployeeId").shift().alias("PreviousEmployeeId"),
+                pl.col("EndDate").shift().alias("PreviousEndDate"),
+            )
+            .filter((pl.col("EmployeeId") == pl.col("PreviousEmployeeId")) & (pl.col("StartDate") <= pl.col("PreviousEndDate")))
+            .drop("PreviousEmployeeId")
+    )
+
+
+def _violations(check: str, table: str, violations: pl.LazyFrame, sample_rows: int) -> CheckResult:
+    count, sample = pl.collect_all([violations.select(pl.len()), violations.head(sample_rows)], engine="streaming")
+    return CheckResult(check, table, count.item(), sample.to_dicts())
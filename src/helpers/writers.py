@@ -0,0 +1,323 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+import gzip
+import os
+import shutil
+
+import polars as pl
+from polars.io.plugins import register_io_source
+
+from helpers.schemas import to_legacy_csv
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+DEFAULT_OUTPUT_ROOT = "./src/data/output"
+CSV_CHUNK_BYTES = 16 * 1024 * 1024
+FORMATS = ("csv", "parquet", "ipc")
+COMPRESSIONS = {
+    "csv": (None, "gzip", "zstd"),
+    "parquet": (None, "uncompressed", "snappy", "gzip", "brotli", "lz4", "zstd"),
+    "ipc": (None, "uncompressed", "lz4", "zstd"),
+}
+EXTENSIONS = {
+    ("csv", None): ".csv",
+    ("csv", "gzip"): ".csv.gz",
+    ("csv", "zstd"): ".csv.zst",
+    ("parquet", None): ".parquet",
+    ("ipc", None): ".arrow",
+}
+
+
+@dataclass(frozen=True)
+class OutputConfig:
+    root: str = DEFAULT_OUTPUT_ROOT
+    format: str = "csv"
+    compression: Optional[str] = None
+    compression_level: Optional[int] = None
+    row_group_size: Optional[int] = None
+    partition_by: Optional[str] = None
+    partition_size: Optional[int] = None
+
+    def __post_init__(self):
+        if self.format not in FORMATS:
+            raise ValueError(f"Unknown output format: {self.format}")
+        if self.compression not in COMPRESSIONS[self.format]:
+            raise ValueError(f"Unsupported {self.format} compression: {self.compression}")
+        # checked here rather than at the first write, which only comes after every table has been generated
+        if self.format == "csv" and self.compression == "zstd" and zstandard is None:
+            raise ImportError("zstd compressed CSV output requires the zstandard package")
+        if self.partition_size is not None and self.partition_by is None:
+            raise ValueError("partition_size requires partition_by")
+
+    @property
+    def extension(self) -> str:
+        if self.format == "csv":
+            return EXTENSIONS[(self.format, self.compression)]
+        return EXTENSIONS[(self.format, None)]
+
+    def is_partitioned(self, columns: List[str]) -> bool:
+        return self.partition_by is not None and self.partition_by in columns
+
+    def table_path(self, country: str, table_name: str, run_date: Optional[str] = None) -> str:
+        return os.path.join(
+            self.root,
+            country,
+            f"{table_prefix(country, table_name)}{run_date or datetime.now().strftime('%Y%m%d')}"
+        )
+
+    def file_path(self, country: str, table_name: str, part: Optional[int] = None, run_date: Optional[str] = None) -> str:
+        suffix = "" if part is None else f".part-{part:05d}"
+        return f"{self.table_path(country, table_name, run_date)}{suffix}{self.extension}"
+
+
+class TableSink:
+    def __init__(self, config: OutputConfig, country: str, table_name: str, chunked: bool = False, part: Optional[int] = None):
+        self.config = config
+        self.table_path = config.table_path(country, table_name)
+        self.chunked = chunked
+        self.part = part
+        self.paths: List[str] = []
+        self.is_dataset: Optional[bool] = None
+        self._file_path = config.file_path(country, table_name, part)
+        self._csv_file: Optional[IO[bytes]] = None
+        self._writes = 0
+
+    def write(self, df: pl.DataFrame):
+        if self.is_dataset is None:
+            # parquet and ipc files cannot be appended to, so several writes become parts of a dataset directory
+            self.is_dataset = self.config.is_partitioned(df.columns) or (
+                self.config.format != "csv" and (self.chunked or self.part is not None)
+            )
+
+        if self.is_dataset:
+            part_number = self.part if self.part is not None else self._writes
+            for partition_dir, frame in self._partitions(df):
+                directory = os.path.join(self.table_path, partition_dir)
+                os.makedirs(directory, exist_ok=True)
+                path = os.path.join(directory, f"part-{part_number:05d}{self.config.extension}")
+                write_file(frame, path, self.config)
+                self.paths.append(path)
+        elif self.config.format == "csv":
+            if self._csv_file is None:
+                os.makedirs(os.path.dirname(self._file_path), exist_ok=True)
+                self._csv_file = open_csv(self._file_path, "wb", self.config.compression)
+                self.paths.append(self._file_path)
+            to_legacy_csv(df).write_csv(self._csv_file, separator=";", include_header=self._writes == 0)
+        else:
+            if self._writes:
+                raise ValueError(f"{self._file_path} is a single {self.config.format} file, open the sink as chunked")
+            os.makedirs(os.path.dirname(self._file_path), exist_ok=True)
+            write_file(df, self._file_path, self.config)
+            self.paths.append(self._file_path)
+
+        self._writes += 1
+
+    def close(self):
+        if self._csv_file is not None:
+            self._csv_file.close()
+            self._csv_file = None
+
+    def __enter__(self) -> "TableSink":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _partitions(self, df: pl.DataFrame) -> Iterator[Tuple[str, pl.DataFrame]]:
+        col = self.config.partition_by
+        if not self.config.is_partitioned(df.columns):
+            yield "", df
+            return
+
+        size = self.config.partition_size
+        if size is None:
+            for key, frame in df.partition_by(col, as_dict=True, maintain_order=True).items():
+                yield f"{col}={_partition_value(key)}", frame
+            return
+
+        keyed = df.with_columns(((pl.col(col) // size) * size).alias("__partition"))
+        for key, frame in keyed.partition_by("__partition", as_dict=True, maintain_order=True).items():
+            start = _partition_value(key)
+            yield f"{col}={start}-{start + size - 1}", frame.drop("__partition")
+
+
+def open_csv(path: str, mode: str, compression: Optional[str]) -> IO[bytes]:
+    if compression is None:
+        return open(path, mode)
+    if compression == "gzip":
+        return gzip.open(path, mode)
+    if zstandard is None:
+        raise ImportError("zstd compressed CSV output requires the zstandard package")
+    return zstandard.open(path, mode)
+
+
+def write_file(df: pl.DataFrame, path: str, config: OutputConfig):
+    if config.format == "parquet":
+        df.write_parquet(
+            path,
+            compression=config.compression or "zstd",
+            compression_level=config.compression_level,
+            row_group_size=config.row_group_size
+        )
+    elif config.format == "ipc":
+        df.write_ipc(path, compression=config.compression or "uncompressed")
+    else:
+        with open_csv(path, "wb", config.compression) as f:
+            to_legacy_csv(df).write_csv(f, separator=";")
+
+
+def write_table(df: pl.DataFrame, config: OutputConfig, country: str, table_name: str, part: Optional[int] = None) -> List[str]:
+    with TableSink(config, country, table_name, part=part) as sink:
+        sink.write(df)
+    return sink.paths
+
+
+def sink_table(lf: pl.LazyFrame, config: OutputConfig, country: str, table_name: str) -> List[str]:
+    path = config.file_path(country, table_name)
+    streamable = not config.is_partitioned(lf.collect_schema().names()) and (
+        config.format != "csv" or config.compression is None
+    )
+    if not streamable:
+        # compressed CSV and partitioned datasets go through the sink batch by batch instead
+        with TableSink(config, country, table_name, chunked=True) as sink:
+            for batch in lf.collect_batches():
+                sink.write(batch)
+        return sink.paths
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if config.format == "parquet":
+        lf.sink_parquet(
+            path,
+            compression=config.compression or "zstd",
+            compression_level=config.compression_level,
+            row_group_size=config.row_group_size
+        )
+    elif config.format == "ipc":
+        lf.sink_ipc(path, compression=config.compression or "uncompressed")
+    else:
+        to_legacy_csv(lf).sink_csv(path, separator=";")
+    return [path]
+
+
+def merge_csv_parts(part_paths: List[str], target_path: str, compression: Optional[str] = None):
+    with open_csv(target_path, "wb", compression) as target:
+        for i, part_path in enumerate(part_paths):
+            with open_csv(part_path, "rb", compression) as part:
+                if i > 0:
+                    part.readline()
+                shutil.copyfileobj(part, target)
+            os.remove(part_path)
+
+
+def table_prefix(country: str, table_name: str) -> str:
+    return f"PAYROLL_AMR_{country}001_{table_name}_D"
+
+
+def run_dates(config: OutputConfig, country: str, table_name: str) -> List[str]:
+    country_dir = os.path.join(config.root, country)
+    if not os.path.isdir(country_dir):
+        return []
+    prefix = table_prefix(country, table_name)
+    return sorted({
+        name[len(prefix):len(prefix) + 8]
+        for name in os.listdir(country_dir)
+        if name.startswith(prefix) and name[len(prefix):len(prefix) + 8].isdigit()
+    })
+
+
+def table_files(config: OutputConfig, country: str, table_name: str, run_date: Optional[str] = None) -> List[str]:
+    # without an explicit date the latest run wins, so files written on an earlier day or across midnight are found
+    if run_date is None:
+        dates = run_dates(config, country, table_name)
+        run_date = dates[-1] if dates else None
+
+    path = config.file_path(country, table_name, run_date=run_date)
+    if os.path.exists(path):
+        return [path]
+
+    # unmerged shard parts sit next to where the single file would be, datasets get a directory of their own
+    table_path = config.table_path(country, table_name, run_date)
+    country_dir, base_name = os.path.split(table_path)
+    if os.path.isdir(country_dir):
+        parts = sorted(
+            os.path.join(country_dir, name)
+            for name in os.listdir(country_dir)
+            if name.startswith(f"{base_name}.part-") and name.endswith(config.extension)
+        )
+        if parts:
+            return parts
+
+    return sorted(
+        os.path.join(directory, name)
+        for directory, _, names in os.walk(table_path)
+        for name in names
+        if name.endswith(config.extension)
+    )
+
+
+def scan_table(config: OutputConfig, paths: List[str], schema_overrides: Optional[Dict[str, pl.DataType]] = None) -> pl.LazyFrame:
+    if config.format == "parquet":
+        return pl.scan_parquet(paths)
+    if config.format == "ipc":
+        return pl.scan_ipc(paths)
+    if config.compression is None:
+        return pl.scan_csv(paths, separator=";", schema_overrides=schema_overrides)
+    return _scan_compressed_csv(config, paths, schema_overrides)
+
+
+def _scan_compressed_csv(config: OutputConfig, paths: List[str], schema_overrides: Optional[Dict[str, pl.DataType]]) -> pl.LazyFrame:
+    # polars cannot scan a compressed stream, so parts are decompressed in line-aligned blocks one at a time and every
+    # query pays for a fresh pass instead of holding whole tables in memory
+    def chunks(path: str, schema: Optional[pl.Schema] = None, columns: Optional[List[str]] = None) -> Iterator[pl.DataFrame]:
+        with open_csv(path, "rb", config.compression) as f:
+            header = f.readline()
+            tail = b""
+            while True:
+                block = f.read(CSV_CHUNK_BYTES)
+                data = tail + block
+                cut = data.rfind(b"\n") + 1 if block else len(data)
+                data, tail = data[:cut], data[cut:]
+                if data or schema is None:
+                    yield pl.read_csv(
+                        header + data, separator=";", columns=columns,
+                        schema_overrides=schema_overrides if schema is None else schema
+                    )
+                if not block:
+                    return
+
+    # later blocks are read with the first block's types, so a column that is empty early on cannot change type midway
+    schema = next(chunks(paths[0])).schema
+
+    def source(
+        with_columns: Optional[List[str]],
+        predicate: Optional[pl.Expr],
+        n_rows: Optional[int],
+        batch_size: Optional[int]
+    ) -> Iterator[pl.DataFrame]:
+        remaining = n_rows
+        columns = with_columns
+        if with_columns is not None and predicate is not None:
+            columns = list(dict.fromkeys([*with_columns, *predicate.meta.root_names()]))
+        for path in paths:
+            for df in chunks(path, schema, columns):
+                if predicate is not None:
+                    df = df.filter(predicate)
+                if with_columns is not None:
+                    df = df.select(with_columns)
+                if remaining is not None:
+                    df = df.head(remaining)
+                    remaining -= len(df)
+                yield df
+                if remaining == 0:
+                    return
+
+    return register_io_source(source, schema=schema)
+
+
+def _partition_value(key):
+    return key[0] if isinstance(key, tuple) else key
@@ -1,17 +1,83 @@
-from helpers import data_manager
+from dataclasses import replace
+from functools import partial
+from typing import Dict, List, Optional
+import argparse
+import sys
+
+import polars as pl
+
+from helpers import batch, data_manager, incremental, sharding, validation
+from helpers.delivery import ArrowConsumer, IpcStreamConsumer, deliver_table_result
+from helpers.instrumentation import NO_INSTRUMENTATION, Instrumentation
+from helpers.scheduler import ScheduleReport, Scheduler, Stage
+from helpers.tables import DIM_EMPLOYEE_KEY_COLUMNS, TABLE_DEPENDENCIES, TableSpec, derive_seed, run_table, write_table_result
+from helpers.writers import COMPRESSIONS, DEFAULT_OUTPUT_ROOT, FORMATS, OutputConfig, TableSink, scan_table
+
  
 class ETLPipeline:
-    def __init__(self, country: str):
+    def __init__(
+        self,
+        country: str,
+        seed: Optional[int] = None,
+        output: Optional[OutputConfig] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        consumer: Optional[ArrowConsumer] = None
+    ):
         self.country = country
+        self.seed = seed
+        self.output = output or OutputConfig()
+        self.consumer = consumer
+        self.instrumentation = instrumentation or NO_INSTRUMENTATION
         self.dim_tables = {}
         self.dm_instances = {}
  
-    def generate_dim_employee(self, src_path: str, rows_amt: int, file_name: str):
-        dm = data_manager.DataManager(src_path, rows_amt)
-        dim_employee = dm.generate_dim_employee()
-        self.dim_tables["DimEmployee"] = dim_employee
-        self.dm_instances["DimEmployee"] = dm
-        dm.save_df_to_csv(dim_employee, self.country, file_name)
+    def generate_dim_employee(self, src_path: str, rows_amt: int, file_name: str, chunk_size: Optional[int] = None):
+        with self.instrumentation.stage("DimEmployee") as stage:
+            dm = data_manager.DataManager(src_path, rows_amt, derive_seed(self.seed, "DimEmployee"))
+            self.dm_instances["DimEmployee"] = dm
+
+            if chunk_size is None:
+                with self.instrumentation.stage("generate") as step:
+                    dim_employee = dm.generate_dim_employee()
+                    step.rows = len(dim_employee)
+                self.dim_tables["DimEmployee"] = dim_employee
+                self._save(dm, dim_employee, "DimEmployee", file_name)
+                stage.rows = len(dim_employee)
+                return
+
+            stage.rows = 0
+            if self.consumer is not None:
+                keys = []
+
+                def chunks():
+                    for chunk in dm.generate_dim_employee_chunks(chunk_size):
+                        stage.rows += len(chunk)
+                        keys.append(chunk.select(DIM_EMPLOYEE_KEY_COLUMNS))
+                        yield chunk
+
+                stage.add_output(self.consumer.consume(self.country, "DimEmployee", chunks()))
+                self.dim_tables["DimEmployee"] = pl.concat(keys)
+                return
+
+            key_schema = None
+            with TableSink(self.output, self.country, file_name, chunked=True) as sink:
+                for chunk in dm.generate_dim_employee_chunks(chunk_size):
+                    sink.write(chunk)
+                    stage.rows += len(chunk)
+                    key_schema = key_schema or chunk.select(DIM_EMPLOYEE_KEY_COLUMNS).schema
+            stage.add_output(sink.paths)
+
+            # only the key columns the downstream tables need are read back, and only when they run
+            self.dim_tables["DimEmployee"] = scan_table(self.output, sink.paths, key_schema).select(DIM_EMPLOYEE_KEY_COLUMNS)
+
+    def dim_table(self, dim_key: str) -> pl.DataFrame:
+        if dim_key not in self.dim_tables:
+            raise ValueError(f"{dim_key} not generated yet")
+
+        dim_df = self.dim_tables[dim_key]
+        if isinstance(dim_df, pl.LazyFrame):
+            dim_df = dim_df.collect()
+        return dim_df
  
     def generate_fact_table(
         self,
@@ -22,22 +88,14 @@ class ETLPipeline:
         month: int,
         employee_dim_key: str = "DimEmployee"
     ):
-        if employee_dim_key not in self.dim_tables:
-            raise ValueError(f"{employee_dim_key} not generated yet")
- 
-        dim_employee_df = self.dim_tables[employee_dim_key]
-        dm = self.dm_instances[employee_dim_key]
- 
-        if fact_name == "FactEmployeePayroll":
-            fact_df = dm.generate_fact_employee_payroll(dim_employee_df, year, month, lookup_path=src_path)
-        elif fact_name == "FactEmployeeAbsence":
-            fact_df = dm.generate_fact_employee_absence(dim_employee_df, year, month, lookup_path=src_path)
-        elif fact_name == "FactEmployeeDisability":
-            fact_df = dm.generate_fact_employee_disability(dim_employee_df, year, month)
-        else:
-            raise ValueError(f"Unknown fact table: {fact_name}")
- 
-        dm.save_df_to_csv(fact_df, self.country, file_name)
+        with self.instrumentation.stage(fact_name) as stage:
+            dim_employee_df = self.dim_table(employee_dim_key)
+            dm = data_manager.DataManager(src_path, len(dim_employee_df), derive_seed(self.seed, fact_name))
+
+            with self.instrumentation.stage("generate") as step:
+                fact_df = dm.generate_fact_table(fact_name, dim_employee_df, year, month, lookup_path=src_path)
+                step.rows = stage.rows = len(fact_df)
+            self._save(dm, fact_df, fact_name, file_name)
  
     def generate_dim_employee_contract(
         self,
@@ -46,56 +104,219 @@ class ETLPipeline:
         file_name: str,
         base_dim_key: str = "DimEmployee"
     ):
-        if base_dim_key not in self.dim_tables:
-            raise ValueError(f"{base_dim_key} not generated yet")
- 
-        base_df = self.dim_tables[base_dim_key]
-        dm = data_manager.DataManager(src_path, rows_amt)
-        dim_contract = dm.generate_dim_employee_contract(base_df)
-        self.dim_tables["DimEmployeeContract"] = dim_contract
-        dm.save_df_to_csv(dim_contract, self.country, file_name)
- 
- 
-if __name__ == "__main__":
-    country = "ES"
-    rows_amt = 100
-    src_root = f"./src/data/input/{country}/PAYROLL_AMR_{country}001"
- 
-    pipeline = ETLPipeline(country)
+        with self.instrumentation.stage("DimEmployeeContract") as stage:
+            base_df = self.dim_table(base_dim_key)
+            dm = data_manager.DataManager(src_path, rows_amt, derive_seed(self.seed, "DimEmployeeContract"))
+
+            with self.instrumentation.stage("generate") as step:
+                dim_contract = dm.generate_dim_employee_contract(base_df)
+                step.rows = stage.rows = len(dim_contract)
+            self.dim_tables["DimEmployeeContract"] = dim_contract
+            self._save(dm, dim_contract, "DimEmployeeContract", file_name)
+
+    def generate_sharded(
+        self,
+        tables: List[TableSpec],
+        rows_amt: int,
+        year: int,
+        month: int,
+        workers: Optional[int] = None,
+        shard_rows: int = sharding.DEFAULT_SHARD_ROWS,
+        merge: bool = True
+    ) -> Dict[str, List[str]]:
+        with self.instrumentation.stage("Sharded") as stage:
+            outputs = sharding.run_sharded(
+                self.country, tables, rows_amt, year, month,
+                workers=workers, seed=self.seed, shard_rows=shard_rows, merge=merge, output=self.output
+            )
+            stage.rows = rows_amt
+            stage.add_output([path for paths in outputs.values() for path in paths])
+        return outputs
+
+    def run(
+        self,
+        tables: List[TableSpec],
+        rows_amt: int,
+        year: int,
+        month: int,
+        workers: Optional[int] = None,
+        executor: str = "thread"
+    ) -> ScheduleReport:
+        if self.consumer is not None and executor != "thread":
+            raise ValueError("In-memory delivery needs the thread executor")
+
+        referenced = {dep for spec in tables for dep in spec.depends_on}
+        # threads share memory, so writes become their own stages and overlap with the next generation
+        overlap_writes = executor == "thread"
+
+        stages = []
+        for spec in tables:
+            task = partial(
+                run_table, spec, self.country, rows_amt, year, month, self.seed,
+                None if overlap_writes else self.output,
+                overlap_writes or spec.table in referenced
+            )
+            # only dimensions stay in the report, facts are let go once they are written or delivered
+            stages.append(Stage(spec.table, task, spec.depends_on, keep_result=spec.table.startswith("Dim")))
+            if self.consumer is not None:
+                deliver = partial(deliver_table_result, spec, self.country, self.consumer)
+                stages.append(Stage(f"{spec.table}:deliver", deliver, (spec.table,)))
+            elif overlap_writes:
+                write = partial(write_table_result, spec, self.country, self.output)
+                stages.append(Stage(f"{spec.table}:write", write, (spec.table,)))
+
+        with self.instrumentation.stage("Scheduled") as stage:
+            report = Scheduler(workers, executor).run(stages)
+            stage.rows = rows_amt
+
+        for spec in tables:
+            if spec.table.startswith("Dim") and report.results.get(spec.table) is not None:
+                self.dim_tables[spec.table] = report.results[spec.table]
+        return report
+
+    def run_incremental(
+        self,
+        tables: List[TableSpec],
+        year: int,
+        month: int,
+        initial_rows: int,
+        new_hires: int = 0,
+        termination_rate: float = 0.0
+    ) -> incremental.RunManifest:
+        with self.instrumentation.stage(f"Incremental{year}{month:02d}") as stage:
+            manifest = incremental.run_month(
+                self.country, tables, year, month, self.output,
+                initial_rows=initial_rows, new_hires=new_hires, termination_rate=termination_rate, seed=self.seed
+            )
+            stage.rows = manifest.dim_employee_rows
+            stage.add_output(manifest.outputs[str(year * 100 + month)])
+        return manifest
+
+    def validate(
+        self,
+        tables: List[TableSpec],
+        report_path: Optional[str] = None,
+        run_date: Optional[str] = None
+    ) -> validation.ValidationReport:
+        with self.instrumentation.stage("Validate") as stage:
+            report = validation.validate_outputs(self.country, tables, self.output, run_date=run_date)
+            stage.rows = sum(check.violations for check in report.checks)
+        if report_path:
+            report.write(report_path)
+        return report
+
+    def _save(self, dm: data_manager.DataManager, df: pl.DataFrame, table: str, file_name: str):
+        if self.consumer is not None:
+            with self.instrumentation.stage("deliver") as step:
+                step.rows = len(df)
+                step.add_output(self.consumer.consume(self.country, table, [df]))
+            return
+
+        with self.instrumentation.stage("write") as step:
+            step.rows = len(df)
+            step.add_output(dm.save_df(df, self.country, file_name, self.output))
  
-    pipeline.generate_dim_employee(
-        src_path=f"{src_root}_DIM001_D20251105.csv",
-        rows_amt=rows_amt,
-        file_name="DIM001"
-    )
  
-    pipeline.generate_fact_table(
-        fact_name="FactEmployeePayroll",
-        src_path=f"{src_root}_FACT001_D20251105.csv",
-        file_name="FACT001",
-        year=2025,
-        month=4
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m main", description="Generate synthetic payroll tables for one or more countries")
+    parser.add_argument(
+        "--country", dest="countries", type=lambda s: s.split(","), default=["ES"],
+        help="comma-separated countries; several countries run as one batch that shares reference data per worker"
     )
- 
-    pipeline.generate_fact_table(
-        fact_name="FactEmployeeAbsence",
-        src_path=f"{src_root}_FACT006_D20251105.csv",
-        file_name="FACT006",
-        year=2025,
-        month=4
+    parser.add_argument("--rows", type=int, default=100, help="number of employees")
+    parser.add_argument("--year", type=int, default=2025)
+    parser.add_argument("--month", type=int, default=4)
+    parser.add_argument(
+        "--tables", type=lambda s: s.split(","), default=list(batch.TABLE_FILES),
+        help="comma-separated tables to generate; tables they depend on are generated too"
     )
- 
-    pipeline.generate_fact_table(
-        fact_name="FactEmployeeDisability",
-        src_path=f"{src_root}_FACT002_D20251105.csv",
-        file_name="FACT002",
-        year=2025,
-        month=4
+    parser.add_argument("--input-root", default=batch.DEFAULT_INPUT_ROOT)
+    parser.add_argument("--source-date", default=batch.DEFAULT_SOURCE_DATE)
+    parser.add_argument(
+        "--source", action="append", default=[], metavar="TABLE=PATH",
+        help="reference file for one table instead of the one under --input-root"
     )
- 
-    pipeline.generate_dim_employee_contract(
-        src_path=f"{src_root}_DIM009_D20251105.csv",
-        rows_amt=rows_amt,
-        file_name="DIM009"
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_ROOT)
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--compression")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--validate", action="store_true", help="check the written files and exit 1 on violations")
+    parser.add_argument(
+        "--arrow-stream", metavar="DIR",
+        help="stream each table as Arrow IPC to DIR/<country>/<table>.arrows (files or named pipes) instead of writing files"
     )
-    
\ No newline at end of file
+    args = parser.parse_args(argv)
+
+    if args.validate and args.arrow_stream:
+        parser.error("--validate checks written files and cannot be combined with --arrow-stream")
+    if len(set(args.countries)) != len(args.countries):
+        parser.error(f"duplicate countries: {','.join(args.countries)}")
+    if len(args.countries) > 1 and (args.source or args.arrow_stream):
+        parser.error("--source and --arrow-stream apply to a single --country")
+
+    unknown = set(args.tables) - set(TABLE_DEPENDENCIES)
+    if unknown:
+        parser.error(f"unknown tables: {', '.join(sorted(unknown))}")
+
+    sources = {}
+    for source in args.source:
+        table, sep, path = source.partition("=")
+        if not sep or not path:
+            parser.error(f"--source expects TABLE=PATH, got {source!r}")
+        if table not in TABLE_DEPENDENCIES:
+            parser.error(f"unknown --source table: {table}")
+        sources[table] = path
+    args.source = sources
+
+    # a bad codec would otherwise only surface in the write stage, after every table has been generated
+    if args.compression not in COMPRESSIONS[args.format]:
+        codecs = ", ".join(c for c in COMPRESSIONS[args.format] if c is not None)
+        parser.error(f"--compression {args.compression} is not supported for {args.format} (choose from {codecs})")
+    return args
+
+
+def cli_tables(args: argparse.Namespace, country: str) -> List[TableSpec]:
+    wanted = set(args.tables)
+    for table in list(wanted):
+        wanted.update(TABLE_DEPENDENCIES[table])
+
+    specs = batch.country_tables(country, args.input_root, args.source_date, [t for t in batch.TABLE_FILES if t in wanted])
+    return [replace(spec, src_path=args.source.get(spec.table, spec.src_path)) for spec in specs]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    output = OutputConfig(root=args.output, format=args.format, compression=args.compression)
+    tables = {country: cli_tables(args, country) for country in args.countries}
+
+    if len(args.countries) > 1:
+        jobs = [batch.CountryJob(country, args.rows, tables[country]) for country in args.countries]
+        outputs = batch.run_batch(jobs, args.year, args.month, workers=args.workers or 1, seed=args.seed, output=output)
+        for country, specs in tables.items():
+            for spec in specs:
+                for path in outputs[country][spec.file_name]:
+                    print(f"{country}  {spec.table:<24} {path}")
+    else:
+        country = args.countries[0]
+        consumer = IpcStreamConsumer(args.arrow_stream) if args.arrow_stream else None
+        pipeline = ETLPipeline(country, seed=args.seed, output=output, consumer=consumer)
+        report = pipeline.run(tables[country], args.rows, args.year, args.month, workers=args.workers)
+        for spec in tables[country]:
+            for path in report.results.get(f"{spec.table}:write") or report.results.get(f"{spec.table}:deliver") or []:
+                print(f"{spec.table:<24} {report.timings[spec.table].seconds:>8.3f}s  {path}")
+
+    if args.validate:
+        failures = [
+            (country, check)
+            for country in args.countries
+            for check in ETLPipeline(country, output=output).validate(tables[country]).failures()
+        ]
+        for country, check in failures:
+            print(f"FAILED {country} {check.check} {check.table}: {check.violations} violations")
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())